@@ -4,8 +4,11 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 
+from .read_snapshot import SnapshotSession
+from .sqlite_tuning import connection_pragmas, engine_options, load_sqlite_config, register_pragmas
 
-db = SQLAlchemy()
+
+db = SQLAlchemy(session_options={"class_": SnapshotSession})
 login_manager = LoginManager()
 csrf = CSRFProtect()
 
@@ -24,16 +27,96 @@ def create_app() -> Flask:
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", default_db)
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # Opt-in SQLite concurrency profile (WAL, busy timeout, cache/mmap sizing)
+    load_sqlite_config(app.config)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
+
+    app.config["DASHBOARD_PAGE_SIZE"] = int(os.environ.get("DASHBOARD_PAGE_SIZE", "100"))
+
+    # "batched" group-commits public submissions from a writer thread
+    app.config["INGEST_MODE"] = os.environ.get("INGEST_MODE", "direct")
+    app.config["INGEST_BATCH_SIZE"] = int(os.environ.get("INGEST_BATCH_SIZE", "100"))
+    app.config["INGEST_BATCH_INTERVAL_MS"] = int(os.environ.get("INGEST_BATCH_INTERVAL_MS", "20"))
+    app.config["INGEST_COMMIT_TIMEOUT"] = float(os.environ.get("INGEST_COMMIT_TIMEOUT", "10"))
+
+    # Bot name -> id entries kept per worker for the submission paths
+    app.config["BOT_CACHE_SIZE"] = int(os.environ.get("BOT_CACHE_SIZE", "10000"))
+
+    # Finished CSV exports are kept here until the data changes ("" disables)
+    app.config["EXPORT_CACHE_DIR"] = os.environ.get(
+        "EXPORT_CACHE_DIR", os.path.join(app.instance_path, "export_cache")
+    )
+
+    # Background export jobs: worker threads per process, output folder, retention
+    app.config["EXPORT_JOB_WORKERS"] = int(os.environ.get("EXPORT_JOB_WORKERS", "1"))
+    app.config["EXPORT_JOB_DIR"] = os.environ.get("EXPORT_JOB_DIR", os.path.join(app.instance_path, "export_jobs"))
+    app.config["EXPORT_JOB_KEEP_HOURS"] = float(os.environ.get("EXPORT_JOB_KEEP_HOURS", "24"))
+
+    # How often each worker's UID availability bitmap picks up other workers' inserts
+    app.config["UID_INDEX_REFRESH_SECONDS"] = float(os.environ.get("UID_INDEX_REFRESH_SECONDS", "5"))
+
+    # Admin reports read from a separate read-only engine: "wal" (live file, one
+    # read transaction per request) or "copy" (backup copy, refreshed when stale)
+    app.config["READ_SNAPSHOT"] = os.environ.get("READ_SNAPSHOT", "").lower()
+    app.config["READ_SNAPSHOT_PATH"] = os.environ.get(
+        "READ_SNAPSHOT_PATH", os.path.join(app.instance_path, "read_snapshot.db")
+    )
+    app.config["READ_SNAPSHOT_MAX_STALENESS"] = float(os.environ.get("READ_SNAPSHOT_MAX_STALENESS", "30"))
+
+    # Logged-in users are cached per worker; CLI password changes touch the stamp file
+    app.config["USER_CACHE_TTL"] = float(os.environ.get("USER_CACHE_TTL", "60"))
+    app.config["AUTH_STAMP_PATH"] = os.environ.get("AUTH_STAMP_PATH", os.path.join(app.instance_path, "auth_stamp"))
+
+    # Old submissions moved by `flask archive` live in this attached database;
+    # "" disables the archive tier
+    app.config["ARCHIVE_DATABASE_PATH"] = os.environ.get("ARCHIVE_DATABASE_PATH", "")
+
+    # gzip/Brotli for HTML, CSV and JSON responses of at least COMPRESS_MIN_SIZE bytes
+    app.config["COMPRESS_RESPONSES"] = os.environ.get("COMPRESS_RESPONSES", "1").lower() in ("1", "true", "yes", "on")
+    app.config["COMPRESS_MIN_SIZE"] = int(os.environ.get("COMPRESS_MIN_SIZE", "500"))
+
+    # Content-hashed static URLs (cached for a year) and their precompressed copies
+    app.config["STATIC_FINGERPRINTS"] = os.environ.get("STATIC_FINGERPRINTS", "1").lower() in ("1", "true", "yes", "on")
+    app.config["STATIC_CACHE_DIR"] = os.environ.get("STATIC_CACHE_DIR", os.path.join(app.instance_path, "static_cache"))
+
+    # Public form POSTs: per-IP and per-UID token buckets and a cap on submissions in
+    # progress, all shared by workers through a small SQLite file
+    app.config["RATE_LIMIT_ENABLED"] = os.environ.get("RATE_LIMIT_ENABLED", "1").lower() in ("1", "true", "yes", "on")
+    app.config["RATE_LIMIT_DATABASE_PATH"] = os.environ.get(
+        "RATE_LIMIT_DATABASE_PATH", os.path.join(app.instance_path, "rate_limit.db")
+    )
+    app.config["RATE_LIMIT_IP_BURST"] = int(os.environ.get("RATE_LIMIT_IP_BURST", "20"))
+    app.config["RATE_LIMIT_IP_PER_MINUTE"] = float(os.environ.get("RATE_LIMIT_IP_PER_MINUTE", "10"))
+    app.config["RATE_LIMIT_UID_BURST"] = int(os.environ.get("RATE_LIMIT_UID_BURST", "5"))
+    app.config["RATE_LIMIT_UID_PER_MINUTE"] = float(os.environ.get("RATE_LIMIT_UID_PER_MINUTE", "2"))
+    app.config["RATE_LIMIT_MAX_CONCURRENT"] = int(os.environ.get("RATE_LIMIT_MAX_CONCURRENT", "8"))
+    app.config["RATE_LIMIT_SLOT_TTL"] = float(os.environ.get("RATE_LIMIT_SLOT_TTL", "60"))
+
+    # Apply pending schema migrations at startup (under a cross-process lock);
+    # with 0, only `flask db-upgrade` migrates
+    app.config["AUTO_MIGRATE"] = os.environ.get("AUTO_MIGRATE", "1").lower() in ("1", "true", "yes", "on")
+
+    # Per-endpoint latency/SQL/template metrics at /admin/metrics
+    app.config["METRICS_ENABLED"] = os.environ.get("METRICS_ENABLED", "1").lower() in ("1", "true", "yes", "on")
+
     # Extensions
     db.init_app(app)
     login_manager.init_app(app)
     csrf.init_app(app)
 
     with app.app_context():
-        from .db_migrations import ensure_schema
+        from .archive import init_archive
+        from .db_migrations import prepare_schema
+        from .metrics import init_metrics
+
+        register_pragmas(db.engine, connection_pragmas(app.config))
+        init_metrics(app, db.engine)
+        init_archive(app)
+
+        prepare_schema()
 
-        db.create_all()
-        ensure_schema()
+    from .read_snapshot import init_read_snapshot
+    init_read_snapshot(app)
 
     login_manager.login_view = "admin.login"
     login_manager.login_message_category = "warning"
@@ -43,6 +126,33 @@ def create_app() -> Flask:
     app.register_blueprint(public_bp)
     app.register_blueprint(admin_bp)
 
+    from .user_cache import init_user_cache
+    init_user_cache(app)
+
+    from .bots import init_bots
+    init_bots(app)
+
+    from .uid_index import init_uid_index
+    init_uid_index(app)
+
+    from .export_cache import init_export_cache
+    init_export_cache(app)
+
+    from .export_jobs import init_export_jobs
+    init_export_jobs(app)
+
+    from .ingest import init_ingest
+    init_ingest(app)
+
+    from .rate_limit import init_rate_limit
+    init_rate_limit(app)
+
+    from .static_assets import init_static_assets
+    init_static_assets(app)
+
+    from .compression import init_compression
+    init_compression(app)
+
     # CLI commands
     from .cli import register_cli
     register_cli(app)
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from flask import Flask, current_app
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import db
+from .models import Bot, Submission, SubsidyBot, WithdrawDate, YyBot, submission_uid_trigrams
+from .purge import _foreign_keys_enforced
+
+
+ARCHIVE_SCHEMA = "archive"
+
+# Renders a statement's unqualified table names as archive.<name>, so the same
+# queries (exports, dashboard, search) run against the archive tier.
+ARCHIVE_OPTIONS = {"schema_translate_map": {None: ARCHIVE_SCHEMA}}
+
+# Tables mirrored in the archive database, parents before children.
+ARCHIVE_TABLES = (
+    Bot.__table__,
+    Submission.__table__,
+    SubsidyBot.__table__,
+    YyBot.__table__,
+    WithdrawDate.__table__,
+    submission_uid_trigrams,
+)
+
+# The archive file's PRAGMA user_version once its tables exist; bump to add an upgrade.
+ARCHIVE_SCHEMA_VERSION = 1
+
+# Submissions moved per transaction; writers queue behind each batch only briefly.
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def tier_options(archive: bool) -> dict:
+    """Execution options that point a statement at the archive tables (or not)."""
+    return ARCHIVE_OPTIONS if archive else {}
+
+
+def archive_enabled() -> bool:
+    return "archive" in current_app.extensions
+
+
+def attach_archive(engine: Engine, database: str) -> None:
+    """ATTACH ``database`` as ``archive`` on every connection ``engine`` opens."""
+
+    @event.listens_for(engine, "connect")
+    def _attach(dbapi_connection, connection_record):
+        dbapi_connection.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (database,))
+
+
+def archive_schema_version(connection) -> int | None:
+    """The attached archive's ``PRAGMA user_version``, or None when no archive is attached."""
+    attached = connection.execute(
+        text("SELECT count(*) FROM pragma_database_list WHERE name = :name"), {"name": ARCHIVE_SCHEMA}
+    ).scalar_one()
+    if not attached:
+        return None
+    return connection.execute(text(f"PRAGMA {ARCHIVE_SCHEMA}.user_version")).scalar_one()
+
+
+def prepare_new_archive(connection: Connection) -> None:
+    """Give an attached, still empty archive file incremental auto-vacuum.
+
+    Only takes effect before the first table is created, and outside a transaction.
+    """
+    if archive_schema_version(connection) is None:
+        return
+    tables = connection.execute(text(f"SELECT count(*) FROM {ARCHIVE_SCHEMA}.sqlite_master")).scalar_one()
+    if not tables:
+        connection.execute(text(f"PRAGMA {ARCHIVE_SCHEMA}.auto_vacuum = INCREMENTAL"))
+
+
+def upgrade_archive(connection: Connection) -> None:
+    """Create whatever archive tables are missing and stamp the archive's version.
+
+    Runs from the schema migrations (app/db_migrations.py), not on every boot.
+    """
+    # execution_options() changes the connection itself; the migrations that follow target main.
+    db.metadata.create_all(connection.execution_options(**ARCHIVE_OPTIONS), tables=list(ARCHIVE_TABLES))
+    connection.execution_options(schema_translate_map=None)
+    # PRAGMA does not take bound parameters.
+    connection.execute(text(f"PRAGMA {ARCHIVE_SCHEMA}.user_version = {ARCHIVE_SCHEMA_VERSION:d}"))
+
+
+def reserve_archived_ids(connection) -> None:
+    """Move the AUTOINCREMENT sequence of main.submissions past every archived id.
+
+    Covers an archive file that was attached later or filled by another
+    database; a no-op when no archive is attached.
+    """
+    if not archive_schema_version(connection):
+        return
+    connection.execute(
+        text(
+            "INSERT INTO main.sqlite_sequence (name, seq) SELECT 'submissions', 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM main.sqlite_sequence WHERE name = 'submissions')"
+        )
+    )
+    connection.execute(
+        text(
+            "UPDATE main.sqlite_sequence "
+            f"SET seq = max(seq, (SELECT coalesce(max(id), 0) FROM {ARCHIVE_SCHEMA}.submissions)) "
+            "WHERE name = 'submissions'"
+        )
+    )
+
+
+def _columns(table, skip: tuple[str, ...] = ()) -> str:
+    return ", ".join(column.name for column in table.c if column.name not in skip)
+
+
+def _copy(table, key: str, skip: tuple[str, ...] = ()) -> str:
+    columns = _columns(table, skip)
+    return (
+        f"INSERT INTO {ARCHIVE_SCHEMA}.{table.name} ({columns}) "
+        f"SELECT {columns} FROM main.{table.name} WHERE {key} IN (SELECT id FROM temp.archive_batch)"
+    )
+
+
+def _move_batch(ids: list[int]) -> None:
+    """Copy one batch of submissions (and children) to the archive, then delete them here.
+
+    Under WAL the two databases commit one after the other rather than
+    atomically, so an archived row with the same id and UID (from a run
+    interrupted in between) is replaced and a re-run is safe. An archived
+    row with the same id but another UID is a different submission: the
+    batch is refused rather than overwrite it.
+    """
+    session = db.session
+    session.execute(text("DELETE FROM temp.archive_batch"))
+    session.execute(text("INSERT INTO temp.archive_batch (id) VALUES (:id)"), [{"id": id} for id in ids])
+    batch = "(SELECT id FROM temp.archive_batch)"
+
+    clashes = session.scalars(
+        text(
+            f"SELECT a.id FROM {ARCHIVE_SCHEMA}.submissions AS a JOIN main.submissions AS m ON m.id = a.id "
+            f"WHERE a.id IN {batch} AND a.uid != m.uid ORDER BY a.id"
+        )
+    ).all()
+    if clashes:
+        raise RuntimeError(
+            "The archive already holds other submissions under id(s) "
+            f"{', '.join(map(str, clashes[:10]))}; nothing in this batch was moved."
+        )
+    copied = f"(SELECT id, uid FROM main.submissions WHERE id IN {batch})"
+    session.execute(
+        text(
+            f"DELETE FROM {ARCHIVE_SCHEMA}.submission_uid_trigrams WHERE submission_id IN "
+            f"(SELECT id FROM {ARCHIVE_SCHEMA}.submissions WHERE (id, uid) IN {copied})"
+        )
+    )
+    session.execute(text(f"DELETE FROM {ARCHIVE_SCHEMA}.submissions WHERE (id, uid) IN {copied}"))
+
+    bots = Bot.__table__
+    session.execute(
+        text(
+            f"INSERT OR IGNORE INTO {ARCHIVE_SCHEMA}.bots ({_columns(bots)}) SELECT {_columns(bots)} FROM main.bots "
+            f"WHERE id IN (SELECT bot_id FROM main.subsidy_bots WHERE submission_id IN {batch} "
+            f"UNION SELECT bot_id FROM main.yy_bots WHERE submission_id IN {batch})"
+        )
+    )
+    session.execute(text(_copy(Submission.__table__, "id")))
+    # Child ids are reassigned: the live tables may reuse ids of archived rows.
+    for table in (SubsidyBot.__table__, YyBot.__table__, WithdrawDate.__table__):
+        session.execute(text(_copy(table, "submission_id", skip=("id",))))
+    session.execute(text(_copy(submission_uid_trigrams, "submission_id")))
+
+    session.execute(
+        text(f"INSERT OR IGNORE INTO main.archived_uids (uid) SELECT uid FROM main.submissions WHERE id IN {batch}")
+    )
+    last_seq = session.scalar(text("SELECT coalesce(max(seq), 0) FROM main.submission_changes"))
+    # Child rows go by ON DELETE CASCADE; stats, trigram and data version triggers fire as for any delete.
+    session.execute(text(f"DELETE FROM main.submissions WHERE id IN {batch}"))
+    # Stats cover both tiers: give back what the stats delete trigger took.
+    _restore_stats(batch)
+    # Tell change feed consumers these rows were archived rather than deleted.
+    session.execute(
+        text(
+            "UPDATE main.submission_changes SET op = 'archive' "
+            f"WHERE seq > :last_seq AND op = 'delete' AND submission_id IN {batch}"
+        ),
+        {"last_seq": last_seq},
+    )
+    session.commit()
+
+
+def _restore_stats(batch: str) -> None:
+    """Add the batch's archived copies back to submission_stats."""
+    rows = db.session.execute(
+        text(
+            "SELECT s_level, count(*) AS submission_count, "
+            "coalesce(sum(missed_salary_amount), 0) AS missed_salary_total, "
+            "coalesce(sum(fortibots_ticket_amount), 0) AS fortibots_ticket_total, "
+            "sum(pending_withdraws != 0) AS pending_withdraw_count, "
+            f"coalesce(sum((SELECT sum(subsidy_amount) FROM {ARCHIVE_SCHEMA}.subsidy_bots "
+            "WHERE submission_id = s.id)), 0) AS subsidy_total, "
+            f"sum((SELECT count(*) FROM {ARCHIVE_SCHEMA}.subsidy_bots WHERE submission_id = s.id)) AS subsidy_bot_count, "
+            f"sum((SELECT count(*) FROM {ARCHIVE_SCHEMA}.yy_bots WHERE submission_id = s.id)) AS yy_bot_count "
+            f"FROM {ARCHIVE_SCHEMA}.submissions AS s WHERE id IN {batch} GROUP BY s_level"
+        )
+    ).mappings().all()
+    if rows:
+        fields = [name for name in rows[0].keys() if name != "s_level"]
+        assignments = ", ".join(f"{name} = {name} + :{name}" for name in fields)
+        db.session.execute(
+            text(f"UPDATE main.submission_stats SET {assignments} WHERE s_level = :s_level"), [dict(row) for row in rows]
+        )
+
+
+def archive_submissions(cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move submissions created before ``cutoff`` to the archive; returns how many moved.
+
+    Submission ids come from an AUTOINCREMENT sequence, which is first moved
+    past the highest archived id, so a live row never takes an archived id.
+    """
+    if not _foreign_keys_enforced():
+        raise RuntimeError("SQLite foreign_keys is off; child rows would be left behind.")
+    if archive_schema_version(db.session) != ARCHIVE_SCHEMA_VERSION:
+        raise RuntimeError("The archive database has no current schema; run `flask --app run.py db-upgrade` first.")
+    ddl = db.session.scalar(text("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = 'submissions'"))
+    if "AUTOINCREMENT" not in ddl.upper():
+        raise RuntimeError("Submission ids are not AUTOINCREMENT yet; run `flask --app run.py db-upgrade` first.")
+    reserve_archived_ids(db.session)
+    db.session.commit()
+
+    candidates = (
+        select(Submission.id).where(Submission.created_at < cutoff).order_by(Submission.id).limit(batch_size)
+    )
+    db.session.execute(text("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)"))
+    moved = last_id = 0
+    try:
+        while True:
+            ids = db.session.scalars(candidates.where(Submission.id > last_id)).all()
+            if not ids:
+                return moved
+            _move_batch(ids)
+            moved += len(ids)
+            last_id = ids[-1]
+    finally:
+        db.session.rollback()
+        db.session.execute(text("DROP TABLE IF EXISTS temp.archive_batch"))
+        db.session.commit()
+
+
+def compact(full_vacuum: bool = False) -> dict[str, dict[str, int]]:
+    """Return free pages to the OS and refresh planner statistics.
+
+    Runs incremental vacuum on each database that has it enabled, or a full
+    VACUUM (which also turns incremental auto-vacuum on) when ``full_vacuum``
+    is set, then a sampled ANALYZE and ``PRAGMA optimize``. Returns page
+    counts per database.
+    """
+    schemas = ["main", ARCHIVE_SCHEMA] if archive_enabled() else ["main"]
+    report: dict[str, dict[str, int]] = {}
+    with db.engine.connect() as connection:
+        raw = connection.connection.driver_connection
+        for schema in schemas:
+            before = raw.execute(f"PRAGMA {schema}.page_count").fetchone()[0]
+            if full_vacuum:
+                raw.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+                raw.executescript(f"VACUUM {schema}")
+            elif raw.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0] == 2:
+                # executescript steps the pragma to completion; execute() frees one page.
+                raw.executescript(f"PRAGMA {schema}.incremental_vacuum")
+            report[schema] = {
+                "pages_before": before,
+                "pages_after": raw.execute(f"PRAGMA {schema}.page_count").fetchone()[0],
+                "free_pages": raw.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0],
+                "auto_vacuum": raw.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0],
+            }
+        # Sampled ANALYZE: bounded cost on big tables, and what a fresh connection's
+        # PRAGMA optimize would skip on SQLite before 3.46.
+        raw.execute("PRAGMA analysis_limit = 1000")
+        for schema in schemas:
+            raw.executescript(f"ANALYZE {schema}")
+        raw.executescript("PRAGMA optimize")
+    return report
+
+
+def init_archive(app: Flask) -> None:
+    """Attach the archive database to the primary engine (call before it connects).
+
+    Its tables are created by the schema migrations, which check its
+    ``user_version`` at startup alongside the main database's.
+    """
+    path = app.config["ARCHIVE_DATABASE_PATH"]
+    if not path:
+        return
+    if db.engine.dialect.name != "sqlite":
+        app.logger.warning("ARCHIVE_DATABASE_PATH needs SQLite; the archive tier is disabled.")
+        return
+
+    attach_archive(db.engine, path)
+    app.extensions["archive"] = path
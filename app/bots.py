@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, insert, select
+
+from . import db
+
+
+def canonical_bot_name(name: str) -> tuple[str, str]:
+    """Return ``(key, display name)``: whitespace collapsed, key case-folded."""
+    display = " ".join(name.split())
+    return display.casefold(), display
+
+
+class BotIdCache:
+    """Bounded LRU of canonical bot key -> bots.id.
+
+    Only ids whose transaction has committed are stored, so an entry can
+    never point at a row that was rolled back.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._ids: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> int | None:
+        with self._lock:
+            bot_id = self._ids.get(key)
+            if bot_id is not None:
+                self._ids.move_to_end(key)
+            return bot_id
+
+    def put(self, key: str, bot_id: int) -> None:
+        with self._lock:
+            self._ids[key] = bot_id
+            self._ids.move_to_end(key)
+            while len(self._ids) > self.size:
+                self._ids.popitem(last=False)
+
+
+def init_bots(app: Flask) -> None:
+    app.extensions["bot_id_cache"] = BotIdCache(app.config["BOT_CACHE_SIZE"])
+
+
+def resolve_bot_ids(names: Iterable[str], session=None) -> dict[str, int]:
+    """Map each canonical bot key in ``names`` to its bots.id, creating missing bots.
+
+    Misses are inserted and read back in the session's current transaction,
+    so a submission that is rolled back takes its new bots with it. Their ids
+    go into the cache only once that transaction commits.
+    """
+    from .models import Bot
+
+    cache: BotIdCache = current_app.extensions["bot_id_cache"]
+    resolved: dict[str, int] = {}
+    missing: dict[str, str] = {}
+    for name in names:
+        key, display = canonical_bot_name(name)
+        if key in resolved or key in missing:
+            continue
+        bot_id = cache.get(key)
+        if bot_id is None:
+            missing[key] = display
+        else:
+            resolved[key] = bot_id
+
+    if missing:
+        session = session or db.session
+        bots = Bot.__table__
+        # The session's connection rather than session.execute: no autoflush (this also runs in before_flush).
+        connection = session.connection()
+        connection.execute(
+            insert(bots).prefix_with("OR IGNORE"),
+            [{"key": key, "name": display} for key, display in missing.items()],
+        )
+        rows = connection.execute(select(bots.c.key, bots.c.id).where(bots.c.key.in_(list(missing))))
+        found = dict(rows.tuples().all())
+        session.info.setdefault("uncommitted_bot_ids", {}).update(found)
+        resolved.update(found)
+    return resolved
+
+
+@event.listens_for(db.session, "before_flush")
+def _intern_pending_bot_names(session, flush_context, instances) -> None:
+    # Bot rows named through ``bot_name`` get their ids in the flushing transaction.
+    pending = [obj for obj in (*session.new, *session.dirty) if getattr(obj, "_pending_bot_name", None) is not None]
+    if not pending:
+        return
+    ids = resolve_bot_ids((obj._pending_bot_name for obj in pending), session=session)
+    for obj in pending:
+        obj.bot_id = ids[canonical_bot_name(obj._pending_bot_name)[0]]
+        obj._pending_bot_name = None
+
+
+@event.listens_for(db.session, "after_commit")
+def _cache_committed_bot_ids(session) -> None:
+    found = session.info.pop("uncommitted_bot_ids", None)
+    if found and has_app_context():
+        cache = current_app.extensions.get("bot_id_cache")
+        if cache is not None:
+            for key, bot_id in found.items():
+                cache.put(key, bot_id)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _forget_rolled_back_bot_ids(session, previous_transaction) -> None:
+    # Any rollback, savepoints included: the ids may no longer exist.
+    session.info.pop("uncommitted_bot_ids", None)
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import json
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .bots import canonical_bot_name, resolve_bot_ids
+from .forms import (
+    MAX_NAME_LENGTH,
+    MAX_SUBSIDY_BOTS,
+    MAX_WITHDRAW_DATES,
+    MAX_YY_BOTS,
+    S_LEVELS,
+    UID_MESSAGE,
+    UID_REGEX,
+)
+from .models import Submission, SubsidyBot, WithdrawDate, YyBot, archived_uids
+
+
+# Submissions per transaction / executemany round.
+BULK_BATCH_SIZE = 1000
+
+DUPLICATE_UID_MESSAGE = "UID already exists. Please use a unique UID."
+
+_UID_RE = re.compile(UID_REGEX)
+
+
+class RecordError(ValueError):
+    def __init__(self, errors: list[str]) -> None:
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+@dataclass
+class SubmissionRecord:
+    """A validated submission ready for core-level inserts."""
+
+    submission: dict
+    subsidy_bots: list[dict] = field(default_factory=list)
+    yy_bots: list[str] = field(default_factory=list)
+    withdraw_dates: list[date] = field(default_factory=list)
+
+
+def _amount(value, label: str, errors: list[str]) -> Decimal | None:
+    if value is None or value == "":
+        return None
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        errors.append(f"{label} must be a number.")
+        return None
+    if not amount.is_finite() or amount < 0:
+        errors.append(f"{label}: Amount must be 0 or greater")
+        return None
+    return amount
+
+
+def _name(value, label: str, errors: list[str]) -> str:
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        errors.append(f"{label} must be a string.")
+        return ""
+    name = value.strip()
+    if len(name) > MAX_NAME_LENGTH:
+        errors.append(f"{label} must be at most {MAX_NAME_LENGTH} characters.")
+    return name
+
+
+def _list(data: dict, key: str, errors: list[str]) -> list:
+    value = data.get(key) or []
+    if not isinstance(value, list):
+        errors.append(f"{key} must be a list.")
+        return []
+    return value
+
+
+def parse_record(data) -> SubmissionRecord:
+    """Validate one decoded JSON object with the PublicSubmissionForm rules."""
+    if not isinstance(data, dict):
+        raise RecordError(["Record must be a JSON object."])
+
+    errors: list[str] = []
+
+    uid = str(data.get("uid") or "").strip()
+    if not _UID_RE.match(uid):
+        errors.append(UID_MESSAGE)
+
+    s_level = data.get("s_level")
+    if s_level not in S_LEVELS:
+        errors.append("s_level must be one of " + ", ".join(S_LEVELS) + ".")
+
+    missed_salary_amount = _amount(data.get("missed_salary_amount"), "missed_salary_amount", errors)
+
+    owed_fortibots_tickets = bool(data.get("owed_fortibots_tickets"))
+    fortibots_ticket_amount = _amount(data.get("fortibots_ticket_amount"), "fortibots_ticket_amount", errors)
+    if owed_fortibots_tickets and fortibots_ticket_amount is None:
+        errors.append("Ticket amount is required when Fortibots tickets are owed.")
+
+    subsidy_bots = []
+    raw_bots = _list(data, "subsidy_bots", errors)
+    if len(raw_bots) > MAX_SUBSIDY_BOTS:
+        errors.append(f"At most {MAX_SUBSIDY_BOTS} subsidy bots are allowed.")
+    for position, bot in enumerate(raw_bots[:MAX_SUBSIDY_BOTS], start=1):
+        if not isinstance(bot, dict):
+            errors.append(f"subsidy_bots[{position}] must be an object.")
+            continue
+        name = _name(bot.get("bot_name"), f"subsidy_bots[{position}].bot_name", errors)
+        amount = _amount(bot.get("subsidy_amount"), f"subsidy_bots[{position}].subsidy_amount", errors)
+        if name and amount is None:
+            errors.append(f"subsidy_bots[{position}]: Amount is required when a bot name is entered.")
+        elif amount is not None and not name:
+            errors.append(f"subsidy_bots[{position}]: Bot name is required when an amount is entered.")
+        elif name:
+            subsidy_bots.append({"bot_name": name, "subsidy_amount": amount})
+
+    owed_yy_bots = bool(data.get("owed_yy_bots"))
+    raw_yy_bots = _list(data, "yy_bots", errors)
+    if len(raw_yy_bots) > MAX_YY_BOTS:
+        errors.append(f"At most {MAX_YY_BOTS} YY bots are allowed.")
+    yy_bots = [
+        name
+        for position, value in enumerate(raw_yy_bots[:MAX_YY_BOTS], start=1)
+        if (name := _name(value, f"yy_bots[{position}]", errors))
+    ]
+    if owed_yy_bots and not yy_bots:
+        errors.append("Please enter at least one YY bot when owed.")
+
+    pending_withdraws = bool(data.get("pending_withdraws"))
+    withdraw_dates = []
+    raw_dates = _list(data, "withdraw_dates", errors)
+    if len(raw_dates) > MAX_WITHDRAW_DATES:
+        errors.append(f"At most {MAX_WITHDRAW_DATES} withdraw dates are allowed.")
+    for value in raw_dates[:MAX_WITHDRAW_DATES]:
+        try:
+            withdraw_dates.append(date.fromisoformat(str(value)))
+        except ValueError:
+            errors.append(f"Invalid withdraw date: {value!r}.")
+    if pending_withdraws and not withdraw_dates:
+        errors.append("Please enter at least one withdraw date when pending withdraws are selected.")
+
+    created_at = datetime.now(timezone.utc)
+    if data.get("created_at"):
+        try:
+            created_at = datetime.fromisoformat(str(data["created_at"]))
+        except ValueError:
+            errors.append("created_at must be an ISO 8601 timestamp.")
+
+    if errors:
+        raise RecordError(errors)
+
+    return SubmissionRecord(
+        submission={
+            "uid": uid,
+            "s_level": s_level,
+            "missed_salary_amount": missed_salary_amount,
+            "owed_yy_bots": owed_yy_bots,
+            "rented_more_than_2_yy_bots": False,
+            "owed_fortibots_tickets": owed_fortibots_tickets,
+            "fortibots_ticket_amount": fortibots_ticket_amount,
+            "pending_withdraws": pending_withdraws,
+            "created_at": created_at,
+        },
+        subsidy_bots=subsidy_bots,
+        # Same as the form: YY bot names are only kept when they are owed.
+        yy_bots=yy_bots if owed_yy_bots else [],
+        withdraw_dates=withdraw_dates,
+    )
+
+
+def _insert_rows(records: list[SubmissionRecord]) -> list[int]:
+    # Bot names are interned in this transaction, so rejected records leave no bots behind.
+    bot_ids = resolve_bot_ids(
+        name
+        for record in records
+        for name in (*(bot["bot_name"] for bot in record.subsidy_bots), *record.yy_bots)
+    )
+    submissions = Submission.__table__
+    ids = (
+        db.session.execute(
+            insert(submissions).returning(submissions.c.id, sort_by_parameter_order=True),
+            [record.submission for record in records],
+        )
+        .scalars()
+        .all()
+    )
+
+    subsidy_rows = []
+    yy_rows = []
+    date_rows = []
+    for submission_id, record in zip(ids, records):
+        subsidy_rows.extend(
+            {
+                "submission_id": submission_id,
+                "bot_id": bot_ids[canonical_bot_name(bot["bot_name"])[0]],
+                "subsidy_amount": bot["subsidy_amount"],
+            }
+            for bot in record.subsidy_bots
+        )
+        yy_rows.extend(
+            {"submission_id": submission_id, "bot_id": bot_ids[canonical_bot_name(name)[0]]}
+            for name in record.yy_bots
+        )
+        date_rows.extend({"submission_id": submission_id, "withdraw_date": day} for day in record.withdraw_dates)
+
+    if subsidy_rows:
+        db.session.execute(insert(SubsidyBot.__table__), subsidy_rows)
+    if yy_rows:
+        db.session.execute(insert(YyBot.__table__), yy_rows)
+    if date_rows:
+        db.session.execute(insert(WithdrawDate.__table__), date_rows)
+    return ids
+
+
+def insert_records(records: list[SubmissionRecord]) -> list[int | str]:
+    """Insert a batch in one transaction; returns an id or error per record."""
+    results: list[int | str] = [DUPLICATE_UID_MESSAGE] * len(records)
+    uids = [record.submission["uid"] for record in records]
+    taken = set(db.session.execute(select(Submission.uid).where(Submission.uid.in_(uids))).scalars())
+    taken.update(db.session.execute(select(archived_uids.c.uid).where(archived_uids.c.uid.in_(uids))).scalars())
+
+    pending: list[int] = []
+    for position, uid in enumerate(uids):
+        if uid not in taken:
+            taken.add(uid)
+            pending.append(position)
+
+    if not pending:
+        db.session.rollback()
+        return results
+
+    try:
+        ids = _insert_rows([records[position] for position in pending])
+        db.session.commit()
+    except IntegrityError:
+        # Another writer claimed one of the UIDs after the check above; fall
+        # back to one transaction per record to find out which.
+        db.session.rollback()
+        for position in pending:
+            try:
+                results[position] = _insert_rows([records[position]])[0]
+                db.session.commit()
+            except IntegrityError as exc:
+                db.session.rollback()
+                if "submissions.uid" not in str(exc.orig):
+                    results[position] = f"Rejected by the database: {exc.orig}"
+        return results
+
+    for position, submission_id in zip(pending, ids):
+        results[position] = submission_id
+    return results
+
+
+def decode_ndjson(lines: Iterable[bytes | str]) -> Iterator[tuple[int, object]]:
+    """Yield ``(line number, decoded value)`` for each non-blank NDJSON line.
+
+    Lines that are not valid JSON come through as a ``RecordError`` value so
+    they can still be reported against their line number.
+    """
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as exc:
+            yield line_no, RecordError([f"Invalid JSON: {exc}"])
+
+
+def ingest_records(
+    items: Iterable[tuple[int, object]],
+    batch_size: int = BULK_BATCH_SIZE,
+    keep_ids: bool = False,
+) -> Iterator[dict]:
+    """Validate and insert decoded records, yielding one result per item.
+
+    With ``keep_ids`` each record's ``submission_id`` is used as the primary
+    key, which lets an export be restored into an empty database unchanged.
+    """
+    batch: list[tuple[int, SubmissionRecord]] = []
+
+    def flush():
+        results = insert_records([record for _, record in batch])
+        for (line_no, _), result in zip(batch, results):
+            if isinstance(result, int):
+                yield {"line": line_no, "status": "accepted", "submission_id": result}
+            else:
+                yield {"line": line_no, "status": "rejected", "errors": [result]}
+        batch.clear()
+
+    for line_no, data in items:
+        try:
+            if isinstance(data, RecordError):
+                raise data
+            record = parse_record(data)
+            if keep_ids:
+                try:
+                    record.submission["id"] = int(data["submission_id"])
+                except (KeyError, TypeError, ValueError):
+                    raise RecordError(["submission_id is required to keep ids."]) from None
+        except RecordError as exc:
+            yield {"line": line_no, "status": "rejected", "errors": exc.errors}
+            continue
+
+        batch.append((line_no, record))
+        if len(batch) >= batch_size:
+            yield from flush()
+
+    if batch:
+        yield from flush()
+
+
+def ingest_lines(lines: Iterable[bytes | str], batch_size: int = BULK_BATCH_SIZE) -> Iterator[dict]:
+    """Validate and insert NDJSON ``lines``, yielding one result per non-blank line."""
+    return ingest_records(decode_ndjson(lines), batch_size)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+from sqlalchemy import func, select
+
+from . import db
+from .exports import EXPORT_CHUNK_SIZE, iter_submission_records
+from .models import Submission, SubmissionChange
+
+
+# Changes after which the submission is no longer in the live tables.
+TOMBSTONE_OPS = ("delete", "archive")
+
+
+def change_window(since: int, limit: int | None = None) -> int:
+    """The cursor a feed starting after ``since`` ends at (at most ``limit`` changes).
+
+    Fixed before streaming so it can go in a response header; changes
+    committed while the body streams are left for the next call.
+    """
+    seq = SubmissionChange.__table__.c.seq
+    if limit is None:
+        latest = db.session.scalar(select(func.max(seq)))
+    else:
+        window = select(seq).where(seq > since).order_by(seq).limit(limit).subquery()
+        latest = db.session.scalar(select(func.max(window.c.seq)))
+    return max(since, latest or 0)
+
+
+def iter_changes(since: int, until: int, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[dict]:
+    """Changes with ``since < seq <= until`` in seq order, one dict per change.
+
+    Inserts and updates carry the submission's current nested record (as in
+    the NDJSON export); deletes are tombstones with just the id, as are
+    moves to the archive tier (op ``archive``). An insert whose submission
+    is gone by now is skipped: its tombstone follows it.
+    """
+    table = SubmissionChange.__table__
+    stmt = (
+        select(table.c.seq, table.c.submission_id, table.c.op)
+        .where(table.c.seq <= until)
+        .order_by(table.c.seq)
+        .limit(chunk_size)
+    )
+    last = since
+    while last < until:
+        chunk = db.session.execute(stmt.where(table.c.seq > last)).all()
+        if not chunk:
+            return
+        ids = sorted({change.submission_id for change in chunk if change.op not in TOMBSTONE_OPS})
+        records = {}
+        if ids:
+            rows = iter_submission_records(len(ids), after_id=0, where=Submission.id.in_(ids))
+            records = {record["submission_id"]: record for record in rows}
+
+        for change in chunk:
+            if change.op in TOMBSTONE_OPS:
+                yield {"seq": change.seq, "op": change.op, "submission_id": change.submission_id}
+                continue
+            record = records.get(change.submission_id)
+            if record is not None:
+                yield {"seq": change.seq, "op": change.op, "submission_id": change.submission_id, "submission": record}
+        last = chunk[-1].seq
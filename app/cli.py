@@ -1,23 +1,183 @@
 from __future__ import annotations
 
+import csv
 import getpass
+import io
+import json
+import os
+import time
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta
 
 import click
 from flask import Flask
 
 from . import db
-from .db_migrations import ensure_schema
-from .models import User
+from .archive import ARCHIVE_BATCH_SIZE, archive_enabled, archive_submissions, compact
+from .bulk import BULK_BATCH_SIZE, decode_ndjson, ingest_records
+from .db_migrations import ensure_unique_uid_index, find_duplicate_uids, schema_version, upgrade
+from .exports import (
+    BOT_FIELDS,
+    EXPORT_CHUNK_SIZE,
+    FLAT_FIELDS,
+    SUBMISSION_FIELDS,
+    flat_row_to_record,
+    iter_bot_rows,
+    iter_flat_rows,
+    iter_submission_records,
+    iter_submission_rows,
+)
+from .models import Submission, User
+from .purge import count_submissions, delete_submissions, submission_filter
+from .stats import rebuild_submission_stats
+from .user_cache import invalidate_user_cache
+
+
+EXPORT_KINDS = {
+    "submissions": (iter_submission_rows, SUBMISSION_FIELDS),
+    "bots": (iter_bot_rows, BOT_FIELDS),
+    "flat": (iter_flat_rows, FLAT_FIELDS),
+    "ndjson": (iter_submission_records, None),
+}
+
+
+class Progress:
+    """Periodic rows-per-second report on stderr for long CLI jobs."""
+
+    def __init__(self, label: str, interval: float = 2.0) -> None:
+        self.label = label
+        self.interval = interval
+        self.count = 0
+        self.last_id = None
+        self.started = time.monotonic()
+        self._reported = self.started
+
+    def advance(self, last_id=None, rows: int = 1) -> None:
+        self.count += rows
+        if last_id is not None:
+            self.last_id = last_id
+        now = time.monotonic()
+        if now - self._reported >= self.interval:
+            self._reported = now
+            self._echo(now)
+
+    def finish(self) -> None:
+        self._echo(time.monotonic())
+
+    def _echo(self, now: float) -> None:
+        elapsed = max(now - self.started, 1e-9)
+        click.echo(
+            f"{self.label}: {self.count:,} rows, {self.count / elapsed:,.0f} rows/s, "
+            f"last submission id {self.last_id}",
+            err=True,
+        )
+
+
+def _detect_format(path: str, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    return "ndjson" if path.endswith((".ndjson", ".jsonl", ".json")) else "csv"
+
+
+def _export_blocks(
+    rows: Iterable[dict], fieldnames: list[str] | None, chunk_size: int, header: bool
+) -> Iterator[tuple[str, object, int]]:
+    """``(text, last submission id, row count)`` blocks of about ``chunk_size`` rows.
+
+    Blocks only end where a submission does, so once one is written every
+    row up to its last id is in the file and that id is a valid --after-id.
+    """
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fieldnames, extrasaction="ignore") if fieldnames else None
+    if writer is not None and header:
+        writer.writeheader()
+    current = None
+    pending = 0
+    for row in rows:
+        submission_id = row["submission_id"]
+        if submission_id != current and pending >= chunk_size:
+            yield buf.getvalue(), current, pending
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+        current = submission_id
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buf.write(json.dumps(row, separators=(",", ":")) + "\n")
+        pending += 1
+    if buf.tell():
+        yield buf.getvalue(), current, pending
+
+
+def _truncate_after(path: str, after_id: int, is_csv: bool) -> int:
+    """Cut an interrupted export back to its last complete row with a submission id <= ``after_id``.
+
+    Drops a half-written last line and any rows written after the reported
+    id. Returns the size kept (0: nothing usable, not even a CSV header).
+    """
+    keep = offset = 0
+    with open(path, "rb") as fh:
+
+        def complete_lines():
+            nonlocal offset
+            for raw in fh:
+                if not raw.endswith(b"\n"):
+                    return
+                offset += len(raw)
+                yield raw.decode("utf-8")
+
+        lines = complete_lines()
+        try:
+            if is_csv:
+                reader = csv.reader(lines)
+                header = next(reader, None)
+                if header is not None and "submission_id" in header:
+                    keep = offset
+                    column = header.index("submission_id")
+                    for record in reader:
+                        if int(record[column]) > after_id:
+                            break
+                        keep = offset
+            else:
+                for line in lines:
+                    if json.loads(line)["submission_id"] > after_id:
+                        break
+                    keep = offset
+        except (csv.Error, ValueError, KeyError, IndexError):
+            pass  # a torn or foreign row: keep what came before it
+    os.truncate(path, keep)
+    return keep
 
 
 def register_cli(app: Flask) -> None:
     @app.cli.command("init-db")
     def init_db():
         """Create database tables."""
-        db.create_all()
-        ensure_schema()
+        upgrade()
+        with db.engine.begin() as connection:
+            indexed = ensure_unique_uid_index(connection)
+            duplicates = [] if indexed else find_duplicate_uids(connection)
+        if duplicates:
+            click.echo(
+                f"Warning: {len(duplicates)} duplicated UID(s) prevent the unique UID index: "
+                + ", ".join(duplicates)
+                + ". The public form checks UIDs with a SELECT until they are resolved; delete the extra rows "
+                "and run init-db again.",
+                err=True,
+            )
         click.echo("Database initialized.")
 
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Apply pending schema migrations."""
+        applied = upgrade()
+        for description in applied:
+            click.echo(f"Applied migration {description}")
+        with db.engine.connect() as connection:
+            version = schema_version(connection)
+        click.echo(f"Schema is at version {version}" + ("" if applied else " (already current)") + ".")
+
     @app.cli.command("create-admin")
     @click.option("--username", prompt=True)
     def create_admin(username: str):
@@ -38,6 +198,7 @@ def register_cli(app: Flask) -> None:
         u.set_password(pw1)
         db.session.add(u)
         db.session.commit()
+        invalidate_user_cache()
         click.echo("Admin user created.")
 
     @app.cli.command("change-password")
@@ -58,4 +219,167 @@ def register_cli(app: Flask) -> None:
 
         user.set_password(pw1)
         db.session.commit()
+        invalidate_user_cache()
         click.echo("Password updated.")
+
+    @app.cli.command("rebuild-stats")
+    def rebuild_stats():
+        """Recompute the per-S-level summary table from scratch."""
+        levels = rebuild_submission_stats()
+        db.session.commit()
+        click.echo(f"Rebuilt stats for {levels} S level(s).")
+
+    @app.cli.command("delete-submissions")
+    @click.option("--uid", "q", default="", help="UID pattern as in the dashboard search (contains, or 123* for prefix).")
+    @click.option("--created-from", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Created on or after.")
+    @click.option("--created-to", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Created on or before.")
+    @click.option("--s-level", default="")
+    @click.option("--dry-run", is_flag=True, help="Only report how many rows match.")
+    @click.option("--yes", is_flag=True, help="Do not ask for confirmation.")
+    def delete_submissions_command(q, created_from, created_to, s_level, dry_run, yes):
+        """Delete every submission matching the filters (with bots and withdraw dates)."""
+        where = submission_filter(
+            q=q.strip(),
+            created_from=created_from.date() if created_from else None,
+            created_to=created_to.date() if created_to else None,
+            s_level=s_level.strip(),
+        )
+        if where is None:
+            raise click.ClickException("Give at least one filter.")
+
+        counts = count_submissions(where)
+        click.echo(
+            f"{counts['submissions']:,} submission(s), {counts['subsidy_bots']:,} subsidy bot(s), "
+            f"{counts['yy_bots']:,} YY bot(s) and {counts['withdraw_dates']:,} withdraw date(s) match."
+        )
+        if dry_run or not counts["submissions"]:
+            return
+        if not yes:
+            click.confirm("Delete them?", abort=True)
+        click.echo(f"Deleted {delete_submissions(where):,} submission(s).")
+
+    @app.cli.command("archive")
+    @click.option("--before", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Move submissions created before this date.")
+    @click.option("--older-than-days", type=int, default=None, help="Move submissions created more than N days ago.")
+    @click.option("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, show_default=True)
+    @click.option("--dry-run", is_flag=True, help="Only report how many rows would move.")
+    @click.option("--full-vacuum", is_flag=True, help="Rewrite the database files with VACUUM (enables incremental vacuum).")
+    def archive_command(before, older_than_days, batch_size, dry_run, full_vacuum):
+        """Move old submissions to the archive database, then compact and re-analyze.
+
+        Without a cutoff only the compaction runs, so this also works as a
+        scheduled maintenance job.
+        """
+        if before and older_than_days is not None:
+            raise click.ClickException("Give --before or --older-than-days, not both.")
+        cutoff = before
+        if older_than_days is not None:
+            cutoff = datetime.combine(datetime.now().date() - timedelta(days=older_than_days), datetime.min.time())
+
+        if cutoff is not None:
+            if not archive_enabled():
+                raise click.ClickException("Set ARCHIVE_DATABASE_PATH to archive submissions.")
+            counts = count_submissions(Submission.created_at < cutoff)
+            click.echo(
+                f"{counts['submissions']:,} submission(s) created before {cutoff:%Y-%m-%d}, with "
+                f"{counts['subsidy_bots']:,} subsidy bot(s), {counts['yy_bots']:,} YY bot(s) and "
+                f"{counts['withdraw_dates']:,} withdraw date(s)."
+            )
+            if dry_run:
+                return
+            started = time.monotonic()
+            try:
+                moved = archive_submissions(cutoff, batch_size)
+            except RuntimeError as exc:
+                raise click.ClickException(str(exc)) from exc
+            click.echo(f"Archived {moved:,} submission(s) in {time.monotonic() - started:.1f}s.")
+        elif dry_run:
+            return
+
+        for schema, pages in compact(full_vacuum).items():
+            mode = {0: "off", 1: "full", 2: "incremental"}.get(pages["auto_vacuum"], "?")
+            click.echo(
+                f"{schema}: {pages['pages_before']:,} -> {pages['pages_after']:,} pages, "
+                f"{pages['free_pages']:,} free (auto_vacuum {mode})"
+            )
+            if pages["auto_vacuum"] != 2 and not full_vacuum:
+                click.echo(f"  {schema} cannot give free pages back; run once with --full-vacuum to enable that.")
+
+    @app.cli.command("export")
+    @click.argument("path", type=click.Path(dir_okay=False))
+    @click.option(
+        "--kind",
+        type=click.Choice(sorted(EXPORT_KINDS)),
+        default=None,
+        help="What to write. Defaults to ndjson for .ndjson/.jsonl paths and flat CSV otherwise.",
+    )
+    @click.option("--after-id", type=int, default=None, help="Resume after this submission id (appends to PATH).")
+    @click.option("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, show_default=True)
+    def export_data(path: str, kind: str | None, after_id: int | None, chunk_size: int):
+        """Stream submissions to a CSV or NDJSON file without going through the web tier."""
+        kind = kind or ("ndjson" if _detect_format(path, None) == "ndjson" else "flat")
+        iter_rows, fieldnames = EXPORT_KINDS[kind]
+        appending = (
+            after_id is not None
+            and os.path.exists(path)
+            and _truncate_after(path, after_id, is_csv=fieldnames is not None) > 0
+        )
+
+        progress = Progress(f"export {kind}")
+        # Always walk in id order, and report an id only once its block is on disk.
+        rows = iter_rows(chunk_size=chunk_size, after_id=after_id or 0)
+        with open(path, "a" if appending else "w", encoding="utf-8", newline="") as fh:
+            for block, last_id, count in _export_blocks(rows, fieldnames, chunk_size, header=not appending):
+                fh.write(block)
+                fh.flush()
+                progress.advance(last_id, rows=count)
+        progress.finish()
+        click.echo(f"Exported {progress.count:,} rows to {path}.")
+
+    @app.cli.command("import")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option(
+        "--format",
+        "fmt",
+        type=click.Choice(["ndjson", "csv"]),
+        default=None,
+        help="Input format: nested NDJSON records or flat.csv rows. Guessed from the extension.",
+    )
+    @click.option("--after-id", type=int, default=None, help="Skip records whose submission_id is at or below this.")
+    @click.option("--batch-size", type=int, default=BULK_BATCH_SIZE, show_default=True)
+    @click.option("--keep-ids", is_flag=True, help="Reuse each record's submission_id as the primary key.")
+    def import_data(path: str, fmt: str | None, after_id: int | None, batch_size: int, keep_ids: bool):
+        """Load submissions from an export file in batched transactions."""
+        fmt = _detect_format(path, fmt)
+        progress = Progress("import")
+        rejected = 0
+
+        with open(path, encoding="utf-8", newline="") as fh:
+            if fmt == "ndjson":
+                items = decode_ndjson(fh)
+            else:
+                reader = csv.DictReader(fh)
+                items = ((reader.line_num, flat_row_to_record(row)) for row in reader)
+
+            # Source ids of records still in flight, so progress only reports
+            # ids whose batch has been committed (safe to pass to --after-id).
+            source_ids: dict[int, object] = {}
+
+            def resumed():
+                for line_no, data in items:
+                    source_id = data.get("submission_id") if isinstance(data, dict) else None
+                    if after_id is not None and source_id is not None and int(source_id) <= after_id:
+                        continue
+                    source_ids[line_no] = source_id
+                    yield line_no, data
+
+            for result in ingest_records(resumed(), batch_size=batch_size, keep_ids=keep_ids):
+                source_id = source_ids.pop(result["line"], None)
+                if result["status"] == "rejected":
+                    rejected += 1
+                    click.echo(f"line {result['line']}: " + "; ".join(result["errors"]), err=True)
+                    source_id = None
+                progress.advance(source_id)
+
+        progress.finish()
+        click.echo(f"Imported {progress.count - rejected:,} submissions ({rejected:,} rejected).")
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import zlib
+from collections.abc import Iterable, Iterator
+
+from flask import Flask, Response, request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+
+# Text responses worth compressing: pages, CSV exports, JSON and NDJSON APIs.
+COMPRESSIBLE_MIMETYPES = frozenset(
+    {"text/html", "text/csv", "text/plain", "application/json", "application/x-ndjson"}
+)
+
+GZIP_LEVEL = 6
+# Brotli's fast range; quality 11 is only worth it for static files compressed once.
+BROTLI_QUALITY = 4
+
+
+def available_encodings() -> list[str]:
+    """Content codings this process can produce, preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(encodings: list[str]) -> str | None:
+    """Best of ``encodings`` the client accepts (honouring q-values), or None for identity."""
+    best = request.accept_encodings.best_match(encodings)
+    return best if best in encodings else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str) -> None:
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._gzip = None
+        else:
+            self._brotli = None
+            # wbits=31: gzip container rather than a raw zlib stream.
+            self._gzip = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress ``data`` and flush, so the client sees it without waiting for the end."""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._gzip.flush(zlib.Z_FINISH)
+
+
+def _compress_stream(body: Iterable, compressor: _Compressor) -> Iterator[bytes]:
+    try:
+        for chunk in body:
+            data = compressor.chunk(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        # Let the wrapped body clean up (export cache files, request context).
+        close = getattr(body, "close", None)
+        if close is not None:
+            close()
+
+
+def compress_response(response: Response, min_size: int) -> Response:
+    """Encode ``response`` for the client if it is a compressible, full, uncompressed body."""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or response.cache_control.no_transform
+        or request.method == "HEAD"
+    ):
+        return response
+    encoding = negotiate_encoding(available_encodings())
+    if encoding is None:
+        return response
+
+    streamed = response.is_streamed or response.direct_passthrough
+    if not streamed and (response.content_length or 0) < min_size:
+        return response
+
+    compressor = _Compressor(encoding)
+    if streamed:
+        response.response = _compress_stream(response.response, compressor)
+        response.direct_passthrough = False
+        response.headers.pop("Content-Length", None)
+        # Byte ranges would refer to the uncompressed file.
+        response.headers.pop("Accept-Ranges", None)
+    else:
+        response.set_data(compressor.chunk(response.get_data()) + compressor.finish())
+    response.headers["Content-Encoding"] = encoding
+    # A different representation of the same resource: keep the validator, weakly.
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app: Flask) -> None:
+    if not app.config["COMPRESS_RESPONSES"]:
+        return
+
+    min_size = app.config["COMPRESS_MIN_SIZE"]
+
+    @app.after_request
+    def _compress(response: Response) -> Response:
+        return compress_response(response, min_size)
@@ -1,45 +1,559 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+from datetime import date
+
+from flask import current_app
 from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
 
 from . import db
+from . import models  # imported so every table is registered on db.metadata
+from .archive import (
+    ARCHIVE_SCHEMA_VERSION,
+    archive_schema_version,
+    prepare_new_archive,
+    reserve_archived_ids,
+    upgrade_archive,
+)
+from .stats import rebuild_submission_stats
 
 
-def ensure_schema() -> None:
-    inspector = inspect(db.engine)
-    if "submissions" not in inspector.get_table_names():
-        return
+# Every starting offset a String(128) UID can have a trigram at. Triggers
+# cannot use recursive CTEs, so the offsets are spelled out as a VALUES list.
+_TRIGRAM_OFFSETS = "(VALUES " + ", ".join(f"({i})" for i in range(1, 127)) + ") AS p"
+
+
+def _trigram_select(uid: str, submission_id: str, source: str | None = None) -> str:
+    tables = f"{source}, {_TRIGRAM_OFFSETS}" if source else _TRIGRAM_OFFSETS
+    return (
+        f"SELECT substr(lower({uid}), p.column1, 3), {submission_id} FROM {tables} "
+        f"WHERE p.column1 <= length({uid}) - 2"
+    )
+
+
+_UID_TRIGRAM_TRIGGERS = {
+    "submissions_uid_trigrams_ai": f"""
+        CREATE TRIGGER submissions_uid_trigrams_ai AFTER INSERT ON submissions BEGIN
+            INSERT OR IGNORE INTO submission_uid_trigrams (trigram, submission_id)
+            {_trigram_select("NEW.uid", "NEW.id")};
+        END
+    """,
+    "submissions_uid_trigrams_ad": f"""
+        CREATE TRIGGER submissions_uid_trigrams_ad AFTER DELETE ON submissions BEGIN
+            DELETE FROM submission_uid_trigrams
+            WHERE submission_id = OLD.id
+              AND trigram IN (SELECT substr(lower(OLD.uid), p.column1, 3) FROM {_TRIGRAM_OFFSETS});
+        END
+    """,
+    "submissions_uid_trigrams_au": f"""
+        CREATE TRIGGER submissions_uid_trigrams_au AFTER UPDATE OF uid ON submissions BEGIN
+            DELETE FROM submission_uid_trigrams WHERE submission_id = OLD.id
+              AND trigram IN (SELECT substr(lower(OLD.uid), p.column1, 3) FROM {_TRIGRAM_OFFSETS});
+            INSERT OR IGNORE INTO submission_uid_trigrams (trigram, submission_id)
+            {_trigram_select("NEW.uid", "NEW.id")};
+        END
+    """,
+}
+
+
+# Per-s_level totals in submission_stats, maintained in the same transaction as
+# every insert/delete. Subsidy bots are inserted after their submission, so they
+# add to the parent's level; when a submission is deleted its remaining bots are
+# subtracted up front, and bot rows removed afterwards by the FK cascade find no
+# parent and change nothing.
+_SUBMISSION_STATS_TRIGGERS = {
+    "submissions_stats_ai": """
+        CREATE TRIGGER submissions_stats_ai AFTER INSERT ON submissions BEGIN
+            INSERT OR IGNORE INTO submission_stats (
+                s_level, submission_count, missed_salary_total, fortibots_ticket_total,
+                subsidy_total, subsidy_bot_count, yy_bot_count, pending_withdraw_count
+            ) VALUES (NEW.s_level, 0, 0, 0, 0, 0, 0, 0);
+            UPDATE submission_stats SET
+                submission_count = submission_count + 1,
+                missed_salary_total = missed_salary_total + coalesce(NEW.missed_salary_amount, 0),
+                fortibots_ticket_total = fortibots_ticket_total + coalesce(NEW.fortibots_ticket_amount, 0),
+                pending_withdraw_count = pending_withdraw_count + (NEW.pending_withdraws != 0)
+            WHERE s_level = NEW.s_level;
+        END
+    """,
+    "submissions_stats_bd": """
+        CREATE TRIGGER submissions_stats_bd BEFORE DELETE ON submissions BEGIN
+            UPDATE submission_stats SET
+                submission_count = submission_count - 1,
+                missed_salary_total = missed_salary_total - coalesce(OLD.missed_salary_amount, 0),
+                fortibots_ticket_total = fortibots_ticket_total - coalesce(OLD.fortibots_ticket_amount, 0),
+                pending_withdraw_count = pending_withdraw_count - (OLD.pending_withdraws != 0),
+                subsidy_total = subsidy_total - (
+                    SELECT coalesce(sum(subsidy_amount), 0) FROM subsidy_bots WHERE submission_id = OLD.id
+                ),
+                subsidy_bot_count = subsidy_bot_count - (
+                    SELECT count(*) FROM subsidy_bots WHERE submission_id = OLD.id
+                ),
+                yy_bot_count = yy_bot_count - (SELECT count(*) FROM yy_bots WHERE submission_id = OLD.id)
+            WHERE s_level = OLD.s_level;
+        END
+    """,
+    "subsidy_bots_stats_ai": """
+        CREATE TRIGGER subsidy_bots_stats_ai AFTER INSERT ON subsidy_bots BEGIN
+            UPDATE submission_stats SET
+                subsidy_total = subsidy_total + NEW.subsidy_amount,
+                subsidy_bot_count = subsidy_bot_count + 1
+            WHERE s_level = (SELECT s_level FROM submissions WHERE id = NEW.submission_id);
+        END
+    """,
+    "subsidy_bots_stats_ad": """
+        CREATE TRIGGER subsidy_bots_stats_ad AFTER DELETE ON subsidy_bots BEGIN
+            UPDATE submission_stats SET
+                subsidy_total = subsidy_total - OLD.subsidy_amount,
+                subsidy_bot_count = subsidy_bot_count - 1
+            WHERE s_level = (SELECT s_level FROM submissions WHERE id = OLD.submission_id);
+        END
+    """,
+    "yy_bots_stats_ai": """
+        CREATE TRIGGER yy_bots_stats_ai AFTER INSERT ON yy_bots BEGIN
+            UPDATE submission_stats SET yy_bot_count = yy_bot_count + 1
+            WHERE s_level = (SELECT s_level FROM submissions WHERE id = NEW.submission_id);
+        END
+    """,
+    "yy_bots_stats_ad": """
+        CREATE TRIGGER yy_bots_stats_ad AFTER DELETE ON yy_bots BEGIN
+            UPDATE submission_stats SET yy_bot_count = yy_bot_count - 1
+            WHERE s_level = (SELECT s_level FROM submissions WHERE id = OLD.submission_id);
+        END
+    """,
+}
+
+
+_BUMP_DATA_VERSION = (
+    "UPDATE data_version SET counter = counter + 1, changed_at = datetime('now') WHERE id = 1;"
+)
+
+_DATA_VERSION_TRIGGERS = {
+    f"submissions_data_version_{suffix}": f"""
+        CREATE TRIGGER submissions_data_version_{suffix} AFTER {event} ON submissions BEGIN
+            {_BUMP_DATA_VERSION}
+        END
+    """
+    for suffix, event in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+}
 
-    columns = {column["name"] for column in inspector.get_columns("submissions")}
-    alterations: list[str] = []
 
-    if "owed_yy_bots" not in columns:
-        alterations.append(
-            "ALTER TABLE submissions ADD COLUMN owed_yy_bots BOOLEAN NOT NULL DEFAULT 0"
+# One submission_changes row per submissions write, in commit order: SQLite
+# serializes writers, so a reader never sees a lower seq appear later.
+_CHANGE_LOG_TRIGGERS = {
+    f"submissions_changes_{suffix}": f"""
+        CREATE TRIGGER submissions_changes_{suffix} AFTER {event} ON submissions BEGIN
+            INSERT INTO submission_changes (submission_id, op, changed_at)
+            VALUES ({row}.id, '{op}', datetime('now'));
+        END
+    """
+    for suffix, event, row, op in (
+        ("ai", "INSERT", "NEW", "insert"),
+        ("au", "UPDATE", "NEW", "update"),
+        ("ad", "DELETE", "OLD", "delete"),
+    )
+}
+
+
+# Same error as the unique index, so every insert path reports a duplicate UID.
+_ARCHIVED_UID_TRIGGERS = {
+    "submissions_archived_uid_bi": """
+        CREATE TRIGGER submissions_archived_uid_bi BEFORE INSERT ON submissions
+        WHEN EXISTS (SELECT 1 FROM archived_uids WHERE uid = NEW.uid) BEGIN
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: submissions.uid');
+        END
+    """,
+}
+
+
+def find_duplicate_uids(connection: Connection | None = None) -> list[str]:
+    rows = (connection or db.session).execute(
+        text("SELECT uid FROM submissions GROUP BY uid HAVING COUNT(*) > 1 ORDER BY uid")
+    )
+    return [row[0] for row in rows]
+
+
+def _uid_index(connection: Connection) -> dict | None:
+    indexes = {index["name"]: index for index in inspect(connection).get_indexes("submissions")}
+    return indexes.get("ix_submissions_uid")
+
+
+def ensure_unique_uid_index(connection: Connection) -> bool:
+    """Create the unique UID index unless duplicated UIDs prevent it; True if present."""
+    existing = _uid_index(connection)
+    if existing and existing["unique"]:
+        return True
+
+    duplicates = find_duplicate_uids(connection)
+    if duplicates:
+        current_app.logger.warning(
+            "Cannot enforce unique submissions.uid; %d duplicated UID(s): %s. "
+            "New submissions are checked with a SELECT until they are resolved.",
+            len(duplicates),
+            ", ".join(duplicates),
         )
-    if "rented_more_than_2_yy_bots" not in columns:
-        alterations.append(
-            "ALTER TABLE submissions ADD COLUMN rented_more_than_2_yy_bots BOOLEAN NOT NULL DEFAULT 0"
+        return False
+
+    if existing:
+        connection.execute(text("DROP INDEX ix_submissions_uid"))
+    connection.execute(text("CREATE UNIQUE INDEX ix_submissions_uid ON submissions (uid)"))
+    return True
+
+
+def unique_uid_enforced() -> bool:
+    """Whether the unique UID index exists; looked up until it does, then remembered."""
+    if current_app.extensions.get("unique_uid_index"):
+        return True
+    # A connection of its own: the request's session may wait on the batched writer,
+    # and must not hold a pooled connection meanwhile.
+    with db.engine.connect() as connection:
+        existing = _uid_index(connection)
+    enforced = bool(existing and existing["unique"])
+    if enforced:
+        current_app.extensions["unique_uid_index"] = True
+    return enforced
+
+
+def _install_missing_triggers(connection: Connection, triggers: dict[str, str]) -> bool:
+    """Create any of ``triggers`` that do not exist yet; True if any were created."""
+    existing = {
+        row[0]
+        for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))
+    }
+    missing = [name for name in triggers if name not in existing]
+    for name in missing:
+        connection.execute(text(triggers[name]))
+    return bool(missing)
+
+
+_LEGACY_COLUMNS = {
+    "owed_yy_bots": "BOOLEAN NOT NULL DEFAULT 0",
+    "rented_more_than_2_yy_bots": "BOOLEAN NOT NULL DEFAULT 0",
+    "owed_fortibots_tickets": "BOOLEAN NOT NULL DEFAULT 0",
+    "fortibots_ticket_amount": "NUMERIC(12, 2)",
+    "pending_withdraws": "BOOLEAN NOT NULL DEFAULT 0",
+    "withdraw_dates": "VARCHAR(255)",
+}
+
+
+def _baseline(connection: Connection) -> None:
+    """What every worker used to re-check on each boot: tables, legacy columns, indexes, triggers.
+
+    Safe on any pre-versioning database: each step only adds what is missing.
+    """
+    db.metadata.create_all(connection)
+
+    columns = {column["name"] for column in inspect(connection).get_columns("submissions")}
+    for name, ddl in _LEGACY_COLUMNS.items():
+        if name not in columns:
+            connection.execute(text(f"ALTER TABLE submissions ADD COLUMN {name} {ddl}"))
+
+    ensure_unique_uid_index(connection)
+
+    if _install_missing_triggers(connection, _UID_TRIGRAM_TRIGGERS):
+        # (Re)build from scratch: rows inserted while a trigger was absent are unindexed.
+        connection.execute(text("DELETE FROM submission_uid_trigrams"))
+        connection.execute(
+            text(
+                "INSERT OR IGNORE INTO submission_uid_trigrams (trigram, submission_id) "
+                + _trigram_select("uid", "id", source="submissions")
+            )
         )
-    if "owed_fortibots_tickets" not in columns:
-        alterations.append(
-            "ALTER TABLE submissions ADD COLUMN owed_fortibots_tickets BOOLEAN NOT NULL DEFAULT 0"
+
+    if _install_missing_triggers(connection, _SUBMISSION_STATS_TRIGGERS):
+        rebuild_submission_stats(connection)
+
+
+def _money_to_cents(connection: Connection) -> None:
+    """Rewrite the money columns from NUMERIC(12, 2) values to integer cents.
+
+    The declared column type of an existing table stays NUMERIC; with numeric
+    affinity SQLite stores the integers as integers, so no table rebuild is needed.
+    """
+    for table, columns in (
+        ("submissions", ("missed_salary_amount", "fortibots_ticket_amount")),
+        ("subsidy_bots", ("subsidy_amount",)),
+    ):
+        assignments = ", ".join(f"{column} = CAST(round({column} * 100) AS INTEGER)" for column in columns)
+        connection.execute(text(f"UPDATE {table} SET {assignments}"))
+    # The running totals were float sums; recompute them exactly.
+    rebuild_submission_stats(connection)
+
+
+def _withdraw_dates_table(connection: Connection) -> None:
+    """Move the comma-joined submissions.withdraw_dates strings into rows.
+
+    The old column is left in place (no longer mapped) so older code can
+    still read it after a rollback.
+    """
+    table = models.WithdrawDate.__table__
+    table.create(connection, checkfirst=True)
+
+    columns = {column["name"] for column in inspect(connection).get_columns("submissions")}
+    if "withdraw_dates" not in columns:
+        return
+
+    rows = connection.execute(
+        text("SELECT id, withdraw_dates FROM submissions WHERE withdraw_dates IS NOT NULL AND withdraw_dates != ''")
+    )
+    pending: list[dict] = []
+    skipped = 0
+    for submission_id, value in rows:
+        for entry in models.split_withdraw_dates(value):
+            try:
+                pending.append({"submission_id": submission_id, "withdraw_date": date.fromisoformat(entry)})
+            except ValueError:
+                skipped += 1
+        if len(pending) >= 10_000:
+            connection.execute(table.insert(), pending)
+            pending.clear()
+    if pending:
+        connection.execute(table.insert(), pending)
+    if skipped:
+        current_app.logger.warning("Skipped %d unparseable withdraw date(s) during backfill.", skipped)
+
+
+def _rebuild_with_bot_ids(connection: Connection, table, value_columns: tuple[str, ...]) -> None:
+    """Recreate a bot child table with ``bot_id`` in place of its ``bot_name`` text.
+
+    Copies through a temp table, drops the old table (and its triggers and
+    indexes) and creates the new one from the model under the same name.
+    """
+    name = table.name
+    carried = ", ".join(("id", "submission_id", *value_columns))
+    selected = ", ".join(f"old.{column}" for column in ("id", "submission_id", *value_columns))
+    connection.execute(
+        text(
+            f"CREATE TEMP TABLE {name}_copy AS SELECT {selected}, m.bot_id FROM {name} AS old "
+            "JOIN temp.bot_name_map AS m ON m.raw_name = old.bot_name"
         )
-    if "fortibots_ticket_amount" not in columns:
-        alterations.append(
-            "ALTER TABLE submissions ADD COLUMN fortibots_ticket_amount NUMERIC(12, 2)"
+    )
+    connection.execute(text(f"DROP TABLE {name}"))
+    table.create(connection)
+    connection.execute(text(f"INSERT INTO {name} ({carried}, bot_id) SELECT {carried}, bot_id FROM temp.{name}_copy"))
+    connection.execute(text(f"DROP TABLE temp.{name}_copy"))
+
+
+def _intern_bot_names(connection: Connection) -> None:
+    """Replace the free-text bot names on subsidy_bots/yy_bots with ids into ``bots``."""
+    from .bots import canonical_bot_name
+
+    bots = models.Bot.__table__
+    bots.create(connection, checkfirst=True)
+
+    columns = {column["name"] for column in inspect(connection).get_columns("subsidy_bots")}
+    if "bot_name" not in columns:
+        return
+
+    # Earliest spelling of each canonical name wins as its display name.
+    raw_names = connection.execute(
+        text(
+            "SELECT bot_name FROM ("
+            " SELECT bot_name, min(id) AS first_id, 0 AS source FROM subsidy_bots GROUP BY bot_name"
+            " UNION ALL"
+            " SELECT bot_name, min(id) AS first_id, 1 AS source FROM yy_bots GROUP BY bot_name"
+            ") ORDER BY source, first_id"
         )
-    if "pending_withdraws" not in columns:
-        alterations.append(
-            "ALTER TABLE submissions ADD COLUMN pending_withdraws BOOLEAN NOT NULL DEFAULT 0"
+    ).scalars().all()
+
+    displays: dict[str, str] = {}
+    for raw_name in raw_names:
+        key, display = canonical_bot_name(raw_name)
+        displays.setdefault(key, display)
+    if displays:
+        connection.execute(
+            bots.insert().prefix_with("OR IGNORE"),
+            [{"key": key, "name": display} for key, display in displays.items()],
         )
-    if "withdraw_dates" not in columns:
-        alterations.append(
-            "ALTER TABLE submissions ADD COLUMN withdraw_dates VARCHAR(255)"
+    ids = dict(connection.execute(text("SELECT key, id FROM bots")).tuples().all())
+
+    connection.execute(text("CREATE TEMP TABLE bot_name_map (raw_name TEXT PRIMARY KEY, bot_id INTEGER NOT NULL)"))
+    mapping = [{"raw_name": raw, "bot_id": ids[canonical_bot_name(raw)[0]]} for raw in set(raw_names)]
+    if mapping:
+        connection.execute(text("INSERT INTO temp.bot_name_map VALUES (:raw_name, :bot_id)"), mapping)
+
+    _rebuild_with_bot_ids(connection, models.SubsidyBot.__table__, ("subsidy_amount",))
+    _rebuild_with_bot_ids(connection, models.YyBot.__table__, ())
+    connection.execute(text("DROP TABLE temp.bot_name_map"))
+
+    # Dropping the old tables dropped their stats triggers.
+    _install_missing_triggers(connection, _SUBMISSION_STATS_TRIGGERS)
+
+
+def _data_version(connection: Connection) -> None:
+    models.DataVersion.__table__.create(connection, checkfirst=True)
+    connection.execute(
+        text("INSERT OR IGNORE INTO data_version (id, counter, changed_at) VALUES (1, 0, datetime('now'))")
+    )
+    _install_missing_triggers(connection, _DATA_VERSION_TRIGGERS)
+
+
+def _export_jobs(connection: Connection) -> None:
+    models.ExportJob.__table__.create(connection, checkfirst=True)
+
+
+def _change_log(connection: Connection) -> None:
+    """Create the change feed log, seeded with an insert for every existing row.
+
+    A consumer starting from cursor 0 therefore receives the full data set.
+    """
+    models.SubmissionChange.__table__.create(connection, checkfirst=True)
+    if _install_missing_triggers(connection, _CHANGE_LOG_TRIGGERS):
+        connection.execute(text("DELETE FROM submission_changes"))
+        connection.execute(
+            text(
+                "INSERT INTO submission_changes (submission_id, op, changed_at) "
+                "SELECT id, 'insert', coalesce(created_at, datetime('now')) FROM submissions ORDER BY id"
+            )
         )
 
-    for statement in alterations:
-        db.session.execute(text(statement))
 
-    if alterations:
-        db.session.commit()
+def _archive_tier(connection: Connection) -> None:
+    models.archived_uids.create(connection, checkfirst=True)
+    _install_missing_triggers(connection, _ARCHIVED_UID_TRIGGERS)
+    columns = {column["name"] for column in inspect(connection).get_columns("export_jobs")}
+    if "include_archive" not in columns:
+        connection.execute(text("ALTER TABLE export_jobs ADD COLUMN include_archive BOOLEAN NOT NULL DEFAULT 0"))
+
+
+def _autoincrement_submission_ids(connection: Connection) -> None:
+    """Rebuild submissions as AUTOINCREMENT, with the id sequence past every archived id.
+
+    Without it SQLite hands out max(id) + 1 again once the newest rows are
+    archived or deleted, and the archive may already hold that id. Copies
+    through a temp table like the bot table rebuilds; columns the model no
+    longer maps are carried over, and the dropped indexes and triggers are
+    recreated after the copy so none of them fire for it.
+    """
+    ddl = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'submissions'")
+    ).scalar_one()
+    if "AUTOINCREMENT" not in ddl.upper():
+        table = models.Submission.__table__
+        legacy = [
+            column
+            for column in inspect(connection).get_columns("submissions")
+            if column["name"] not in table.c
+        ]
+        connection.execute(text("CREATE TEMP TABLE submissions_copy AS SELECT * FROM submissions"))
+        connection.execute(text("DROP TABLE submissions"))
+        connection.execute(CreateTable(table))
+        for column in legacy:
+            column_type = column["type"].compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE submissions ADD COLUMN {column['name']} {column_type}"))
+        columns = ", ".join([*(column.name for column in table.c), *(column["name"] for column in legacy)])
+        connection.execute(text(f"INSERT INTO submissions ({columns}) SELECT {columns} FROM temp.submissions_copy"))
+        connection.execute(text("DROP TABLE temp.submissions_copy"))
+
+        for index in table.indexes:
+            if index.name != "ix_submissions_uid":
+                index.create(connection)
+        ensure_unique_uid_index(connection)
+        for triggers in (
+            _UID_TRIGRAM_TRIGGERS,
+            _SUBMISSION_STATS_TRIGGERS,
+            _DATA_VERSION_TRIGGERS,
+            _CHANGE_LOG_TRIGGERS,
+            _ARCHIVED_UID_TRIGGERS,
+        ):
+            _install_missing_triggers(connection, triggers)
+    reserve_archived_ids(connection)
+
+
+# Applied in order; a database at PRAGMA user_version N has run the first N.
+# Append new steps here and never edit or reorder released ones.
+MIGRATIONS: list[tuple[str, Callable[[Connection], None]]] = [
+    ("baseline schema, unique UID index, UID trigram index, submission stats", _baseline),
+    ("store money amounts as integer cents", _money_to_cents),
+    ("withdraw dates child table", _withdraw_dates_table),
+    ("interned bot names", _intern_bot_names),
+    ("data version counter for export caching", _data_version),
+    ("background export jobs", _export_jobs),
+    ("submission change log for the incremental export feed", _change_log),
+    ("archived UIDs and the include-archive export option", _archive_tier),
+    ("AUTOINCREMENT submission ids", _autoincrement_submission_ids),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(connection: Connection) -> int:
+    return connection.execute(text("PRAGMA user_version")).scalar_one()
+
+
+def upgrade(lock_timeout_ms: int = 10 * 60 * 1000) -> list[str]:
+    """Apply pending migrations; returns the descriptions of those applied.
+
+    The whole upgrade runs in one ``BEGIN IMMEDIATE`` transaction, which doubles
+    as the cross-process lock: other workers block on it (up to
+    ``lock_timeout_ms``), then re-read the version and find nothing to do.
+    An attached archive database gets its tables first, in the same transaction.
+    """
+    applied: list[str] = []
+    with db.engine.connect() as connection:
+        previous_timeout = connection.execute(text("PRAGMA busy_timeout")).scalar_one()
+        connection.commit()
+        connection.execute(text(f"PRAGMA busy_timeout = {lock_timeout_ms:d}"))
+        # Table rebuilds must not cascade; the pragma is a no-op inside a transaction.
+        connection.execute(text("PRAGMA foreign_keys = OFF"))
+        # Likewise, a new archive's auto_vacuum mode must be set before BEGIN.
+        prepare_new_archive(connection)
+        try:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                version = schema_version(connection)
+                archive_version = archive_schema_version(connection)
+                if archive_version is not None and archive_version < ARCHIVE_SCHEMA_VERSION:
+                    current_app.logger.info("Creating the archive database schema")
+                    upgrade_archive(connection)
+                    applied.append(f"archive: schema version {ARCHIVE_SCHEMA_VERSION}")
+                for number, (description, step) in enumerate(MIGRATIONS, start=1):
+                    if number <= version:
+                        continue
+                    current_app.logger.info("Applying migration %d: %s", number, description)
+                    step(connection)
+                    applied.append(f"{number}: {description}")
+                # PRAGMA does not take bound parameters.
+                connection.execute(text(f"PRAGMA user_version = {max(version, SCHEMA_VERSION):d}"))
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+        finally:
+            connection.execute(text(f"PRAGMA busy_timeout = {previous_timeout:d}"))
+            connection.execute(text("PRAGMA foreign_keys = ON"))
+            connection.commit()
+    return applied
+
+
+def prepare_schema() -> None:
+    """Startup check: a PRAGMA read (two with an archive) when the schema is already current."""
+    if db.engine.dialect.name != "sqlite":
+        db.create_all()
+        return
+
+    with db.engine.connect() as connection:
+        version = schema_version(connection)
+        archive_version = archive_schema_version(connection)
+    archive_pending = archive_version is not None and archive_version < ARCHIVE_SCHEMA_VERSION
+    if version == SCHEMA_VERSION and not archive_pending:
+        return
+    if version > SCHEMA_VERSION:
+        current_app.logger.warning(
+            "Database schema version %d is newer than this code (%d).", version, SCHEMA_VERSION
+        )
+        return
+    if not current_app.config["AUTO_MIGRATE"]:
+        current_app.logger.warning(
+            "Database schema is at version %d (archive %s), code expects %d (archive %d); "
+            "run `flask --app run.py db-upgrade`.",
+            version,
+            "none" if archive_version is None else archive_version,
+            SCHEMA_VERSION,
+            ARCHIVE_SCHEMA_VERSION,
+        )
+        return
+
+    upgrade()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import glob
+import os
+import shutil
+import tempfile
+from collections.abc import Iterator
+from datetime import date, datetime, timezone
+
+from flask import Flask, current_app
+from sqlalchemy import select
+
+from . import db
+from .models import DataVersion
+
+
+def data_version() -> tuple[int, datetime]:
+    """``(counter, last change)`` from the trigger-maintained data_version row."""
+    row = db.session.execute(select(DataVersion.counter, DataVersion.changed_at).where(DataVersion.id == 1)).first()
+    if row is None:
+        return 0, datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return row.counter, row.changed_at.replace(tzinfo=timezone.utc)
+
+
+def export_variant(withdraw_from: date | None, withdraw_to: date | None, include_archive: bool = False) -> str:
+    """Cache key part for the withdraw-date filter (and archive tier) of an export."""
+    variant = f"{withdraw_from or 'start'}_{withdraw_to or 'end'}" if withdraw_from or withdraw_to else "all"
+    return f"{variant}+archive" if include_archive else variant
+
+
+class ExportCache:
+    """Finished CSV exports on disk, one file per (kind, filter variant, data version).
+
+    Files are written under a temporary name and renamed into place only once
+    complete, so a reader never sees a partial file.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, kind: str, variant: str, version: int) -> str:
+        return os.path.join(self.directory, f"{kind}-{variant}-{version}.csv")
+
+    def lookup(self, kind: str, variant: str, version: int) -> str | None:
+        path = self.path(kind, variant, version)
+        return path if os.path.exists(path) else None
+
+    def store(self, kind: str, variant: str, version: int, chunks: Iterator[str]) -> Iterator[str]:
+        """Pass ``chunks`` through while writing them to the cache.
+
+        The file is kept only if the stream completes and the data version is
+        still ``version`` afterwards; older versions of the same export are
+        then removed.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{kind}-", suffix=".tmp")
+        completed = False
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as handle:
+                for chunk in chunks:
+                    handle.write(chunk)
+                    yield chunk
+            completed = data_version()[0] == version
+        finally:
+            if completed:
+                os.replace(temp_path, self.path(kind, variant, version))
+                self._evict(kind, variant, keep=version)
+            else:
+                os.unlink(temp_path)
+
+    def adopt(self, kind: str, variant: str, version: int, source: str) -> bool:
+        """Link a finished export written elsewhere into the cache if ``version`` is still current."""
+        if data_version()[0] != version:
+            return False
+        link_file(source, self.path(kind, variant, version))
+        self._evict(kind, variant, keep=version)
+        return True
+
+    def _evict(self, kind: str, variant: str, keep: int) -> None:
+        keep_path = self.path(kind, variant, keep)
+        pattern = os.path.join(glob.escape(self.directory), f"{glob.escape(kind)}-{glob.escape(variant)}-*.csv")
+        for path in glob.glob(pattern):
+            if path != keep_path:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+
+def link_file(source: str, target: str) -> None:
+    """Hard-link ``source`` to ``target`` (copying across filesystems), replacing ``target``."""
+    temp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, target)
+
+
+def init_export_cache(app: Flask) -> None:
+    if not app.config["EXPORT_CACHE_DIR"]:
+        return
+    app.extensions["export_cache"] = ExportCache(app.config["EXPORT_CACHE_DIR"])
+
+
+def get_export_cache() -> ExportCache | None:
+    return current_app.extensions.get("export_cache")
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime, timedelta, timezone
+
+from flask import Flask, current_app, url_for
+from sqlalchemy import and_, func, select, update
+
+from . import db
+from .archive import tier_options
+from .export_cache import data_version, export_variant, get_export_cache, link_file
+from .exports import CSV_EXPORTS, iter_csv, iter_tiers
+from .models import ExportJob, Submission, SubsidyBot
+from .search import withdraw_date_clause
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _begin_snapshot() -> bool:
+    """Start a read transaction on the session that pins one view of the data.
+
+    Under WAL a reader never blocks writers, so the whole export runs in one
+    transaction. With a rollback journal a long read would stall every
+    commit, so nothing is pinned and False is returned.
+    """
+    if db.engine.dialect.name != "sqlite":
+        db.session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        return True
+    connection = db.session.connection()
+    if connection.exec_driver_sql("PRAGMA journal_mode").scalar() != "wal":
+        return False
+    # pysqlite only opens transactions for writes; begin one explicitly.
+    connection.exec_driver_sql("BEGIN")
+    return True
+
+
+def count_rows(kind: str, where=None, archive: bool = False) -> int:
+    """Number of CSV rows ``kind`` will produce for the submissions filter ``where``."""
+    if kind == "bots":
+        stmt = select(func.count()).select_from(SubsidyBot)
+        if where is not None:
+            stmt = stmt.where(SubsidyBot.submission_id.in_(select(Submission.id).where(where)))
+    else:
+        stmt = select(func.count()).select_from(Submission)
+        if where is not None:
+            stmt = stmt.where(where)
+    return db.session.scalar(stmt, execution_options=tier_options(archive))
+
+
+class ExportJobRunner:
+    """Writes CSV exports to disk on background threads so web workers stay free.
+
+    Job state lives in the export_jobs table, so any worker can report on a
+    job another worker is running. Progress is written back at most every
+    ``progress_interval`` seconds on its own short transaction, and also
+    touches the jobs still queued behind it; a queued or running job that
+    goes ``stale_after`` seconds without an update (its worker was
+    restarted) is shown as failed and purged like a finished one.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        directory: str,
+        workers: int = 1,
+        progress_interval: float = 1.0,
+        stale_after: float = 300,
+        keep_hours: float = 24,
+    ) -> None:
+        self.app = app
+        self.directory = directory
+        self.workers = workers
+        self.progress_interval = progress_interval
+        self.stale_after = timedelta(seconds=stale_after)
+        self.keep = timedelta(hours=keep_hours)
+        os.makedirs(directory, exist_ok=True)
+        self._queue: queue.Queue[int] = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._pid: int | None = None
+
+    def submit(
+        self,
+        kind: str,
+        withdraw_from: date | None = None,
+        withdraw_to: date | None = None,
+        include_archive: bool = False,
+    ) -> ExportJob:
+        self.purge_expired()
+        job = ExportJob(
+            kind=kind, withdraw_from=withdraw_from, withdraw_to=withdraw_to, include_archive=include_archive
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._ensure_threads()
+        self._queue.put(job.id)
+        return job
+
+    def is_stale(self, job: ExportJob) -> bool:
+        if job.status not in ("queued", "running"):
+            return False
+        return job.updated_at.replace(tzinfo=timezone.utc) < _utcnow() - self.stale_after
+
+    def purge_expired(self) -> int:
+        """Delete jobs (and their files) created more than ``keep_hours`` ago."""
+        cutoff = _utcnow() - self.keep
+        jobs = db.session.scalars(select(ExportJob).where(ExportJob.created_at < cutoff)).all()
+        removed = 0
+        for job in jobs:
+            if job.status in ("queued", "running") and not self.is_stale(job):
+                continue
+            if job.path:
+                for path in (job.path, f"{job.path}.part"):
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+            db.session.delete(job)
+            removed += 1
+        if removed:
+            db.session.commit()
+        return removed
+
+    def _ensure_threads(self) -> None:
+        # Started lazily and per process, like the submission batcher.
+        pid = os.getpid()
+        with self._lock:
+            if self._pid != pid:
+                self._queue = queue.Queue()
+                self._threads = []
+                self._pid = pid
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name="export-job", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            with self.app.app_context():
+                try:
+                    self._export(job_id)
+                except Exception as exc:
+                    db.session.rollback()
+                    current_app.logger.exception("Export job %d failed", job_id)
+                    self._update(job_id, status="failed", error=str(exc) or type(exc).__name__, finished_at=_utcnow())
+                finally:
+                    db.session.remove()
+
+    def _update(self, job_id: int, **values) -> None:
+        # Separate connection: the session may be holding the read snapshot.
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(ExportJob.__table__).where(ExportJob.id == job_id).values(updated_at=_utcnow(), **values)
+            )
+
+    def _touch_queued(self) -> None:
+        """Keep the jobs waiting in this process's queue from looking abandoned."""
+        with self._queue.mutex:
+            waiting = list(self._queue.queue)
+        if not waiting:
+            return
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(ExportJob.__table__)
+                .where(ExportJob.id.in_(waiting), ExportJob.status == "queued")
+                .values(updated_at=_utcnow())
+            )
+
+    def _export(self, job_id: int) -> None:
+        self._touch_queued()
+        job = db.session.get(ExportJob, job_id)
+        kind, withdraw_from, withdraw_to = job.kind, job.withdraw_from, job.withdraw_to
+        include_archive = job.include_archive
+        filename, iter_rows, fieldnames = CSV_EXPORTS[kind]
+        variant = export_variant(withdraw_from, withdraw_to, include_archive)
+        path = os.path.join(self.directory, f"{job_id}-{filename}")
+        db.session.rollback()
+
+        pinned = _begin_snapshot()
+        version, _ = data_version()
+        where = withdraw_date_clause(Submission.id, withdraw_from, withdraw_to)
+        if not pinned:
+            # Unpinned reads still leave out submissions added after the start.
+            max_id = db.session.scalar(select(func.max(Submission.id))) or 0
+            where = Submission.id <= max_id if where is None else and_(where, Submission.id <= max_id)
+        total = count_rows(kind, where)
+        if include_archive:
+            total += count_rows(kind, where, archive=True)
+        self._update(job_id, status="running", rows_total=total, data_version=version, path=path)
+
+        cache = get_export_cache()
+        cached = cache.lookup(kind, variant, version) if cache else None
+        if cached:
+            db.session.rollback()
+            link_file(cached, path)
+            self._update(job_id, status="done", rows_written=total, finished_at=_utcnow())
+            return
+
+        part = f"{path}.part"
+        written = [0]
+        try:
+            with open(part, "w", encoding="utf-8", newline="") as handle:
+                rows = iter_tiers(iter_rows, include_archive, where=where)
+                for block in iter_csv(self._progress(job_id, rows, written), fieldnames):
+                    handle.write(block)
+        except BaseException:
+            os.unlink(part)
+            raise
+        db.session.rollback()
+        os.replace(part, path)
+        self._update(job_id, status="done", rows_written=written[0], finished_at=_utcnow())
+        if cache:
+            cache.adopt(kind, variant, version, path)
+
+    def _progress(self, job_id: int, rows: Iterable[dict], written: list[int]) -> Iterator[dict]:
+        reported = time.monotonic()
+        for row in rows:
+            written[0] += 1
+            yield row
+            now = time.monotonic()
+            if now - reported >= self.progress_interval:
+                reported = now
+                self._update(job_id, rows_written=written[0])
+                self._touch_queued()
+
+
+def job_status(job: ExportJob, runner: ExportJobRunner) -> dict:
+    status = "failed" if runner.is_stale(job) else job.status
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "withdraw_from": job.withdraw_from.isoformat() if job.withdraw_from else None,
+        "withdraw_to": job.withdraw_to.isoformat() if job.withdraw_to else None,
+        "include_archive": job.include_archive,
+        "status": status,
+        "rows_written": job.rows_written,
+        "rows_total": job.rows_total,
+        "error": "export worker stopped" if status != job.status else job.error,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "status_url": url_for("admin.export_job_status", job_id=job.id),
+        "download_url": url_for("admin.export_job_download", job_id=job.id) if status == "done" else None,
+    }
+
+
+def init_export_jobs(app: Flask) -> None:
+    if app.config["EXPORT_JOB_WORKERS"] <= 0:
+        return
+
+    app.extensions["export_jobs"] = ExportJobRunner(
+        app,
+        app.config["EXPORT_JOB_DIR"],
+        workers=app.config["EXPORT_JOB_WORKERS"],
+        keep_hours=app.config["EXPORT_JOB_KEEP_HOURS"],
+    )
+
+
+def get_export_jobs() -> ExportJobRunner | None:
+    return current_app.extensions.get("export_jobs")
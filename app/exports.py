@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import csv
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+
+from sqlalchemy import Integer, String, func, select, tuple_, type_coerce
+
+from . import db
+from .archive import tier_options
+from .models import Bot, Cents, Submission, SubsidyBot, WithdrawDate, YyBot, format_cents
+
+
+# Rows fetched per keyset query. Each chunk is a separate short SELECT, so no
+# read lock is held on the database between chunks while the client downloads.
+EXPORT_CHUNK_SIZE = 1000
+
+SUBMISSION_FIELDS = [
+    "submission_id",
+    "created_at",
+    "uid",
+    "s_level",
+    "missed_salary_amount",
+    "owed_yy_bots",
+    "yy_bot_count",
+    "yy_bot_names",
+    "owed_fortibots_tickets",
+    "fortibots_ticket_amount",
+    "pending_withdraws",
+    "withdraw_dates",
+    "bot_count",
+]
+
+BOT_FIELDS = ["submission_id", "bot_name", "subsidy_amount"]
+
+FLAT_FIELDS = [
+    "submission_id",
+    "created_at",
+    "uid",
+    "s_level",
+    "missed_salary_amount",
+    "owed_yy_bots",
+    "owed_fortibots_tickets",
+    "fortibots_ticket_amount",
+    "pending_withdraws",
+    "withdraw_dates",
+    "yy_bot_names",
+    "yy_bot_name",
+    "bot_name",
+    "subsidy_amount",
+]
+
+
+class _LineBuffer:
+    """Minimal file-like sink so csv.writer output can be drained in pieces."""
+
+    def __init__(self) -> None:
+        self._parts: list[str] = []
+
+    def write(self, value: str) -> None:
+        self._parts.append(value)
+
+    def drain(self) -> str:
+        value = "".join(self._parts)
+        self._parts.clear()
+        return value
+
+
+def iter_csv(
+    rows: Iterable[dict],
+    fieldnames: list[str],
+    flush_every: int = EXPORT_CHUNK_SIZE,
+    header: bool = True,
+) -> Iterator[str]:
+    """Encode ``rows`` as CSV, yielding the header first and then text blocks."""
+    buf = _LineBuffer()
+    writer = csv.DictWriter(buf, fieldnames=fieldnames, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+        yield buf.drain()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= flush_every:
+            yield buf.drain()
+            pending = 0
+
+    tail = buf.drain()
+    if tail:
+        yield tail
+
+
+_BOT_NAME = Bot.__table__.c.name.label("bot_name")
+
+
+def _cents(column):
+    """Select a money column as its stored integer, skipping the Decimal conversion."""
+    return type_coerce(column, Integer).label(column.name)
+
+
+def _amount(value: int | None) -> str:
+    return format_cents(value) if value is not None else ""
+
+
+def _yes_no(value) -> str:
+    return "yes" if value else "no"
+
+
+def _iter_submission_chunks(
+    chunk_size: int, after_id: int | None = None, where=None, archive: bool = False
+) -> Iterator[list]:
+    """Yield lists of submission rows in keyset-paginated chunks.
+
+    Rows come in (created_at, id) order. When resuming from ``after_id``
+    they are walked in id order instead, so the id is a complete cursor.
+    ``where`` is an optional filter on the submissions table; ``archive``
+    reads the archive tier's tables instead of the live ones.
+    """
+    table = Submission.__table__
+    if after_id is None:
+        sort_columns = (table.c.created_at, table.c.id)
+    else:
+        sort_columns = (table.c.id,)
+    columns = [_cents(column) if isinstance(column.type, Cents) else column for column in table.c]
+    stmt = select(*columns).order_by(*(column.asc() for column in sort_columns)).limit(chunk_size)
+    if after_id is not None:
+        stmt = stmt.where(table.c.id > after_id)
+    if where is not None:
+        stmt = stmt.where(where)
+
+    last_key = None
+    while True:
+        query = stmt
+        if last_key is not None:
+            query = query.where(tuple_(*sort_columns) > tuple_(*last_key))
+        chunk = db.session.execute(query, execution_options=tier_options(archive)).all()
+        if not chunk:
+            return
+        yield chunk
+        last_key = tuple(getattr(chunk[-1], column.name) for column in sort_columns)
+
+
+def _children_by_submission(table, columns, submission_ids: list[int], archive: bool = False) -> dict[int, list]:
+    grouped: dict[int, list] = defaultdict(list)
+    # Bot child tables are joined to bots so ``columns`` may include _BOT_NAME.
+    source = table.join(Bot.__table__) if "bot_id" in table.c else table
+    rows = db.session.execute(
+        select(table.c.submission_id, *columns)
+        .select_from(source)
+        .where(table.c.submission_id.in_(submission_ids))
+        .order_by(table.c.submission_id, table.c.id),
+        execution_options=tier_options(archive),
+    )
+    for row in rows:
+        grouped[row[0]].append(row)
+    return grouped
+
+
+def _withdraw_dates_by_submission(submission_ids: list[int], archive: bool = False) -> dict[int, list[str]]:
+    # SQLite stores DATE as ISO text already; read it as-is instead of parsing.
+    table = WithdrawDate.__table__
+    day = type_coerce(table.c.withdraw_date, String).label("withdraw_date")
+    grouped = _children_by_submission(table, [day], submission_ids, archive)
+    return {submission_id: [row.withdraw_date for row in rows] for submission_id, rows in grouped.items()}
+
+
+def _counts_by_submission(table, submission_ids: list[int], archive: bool = False) -> dict[int, int]:
+    rows = db.session.execute(
+        select(table.c.submission_id, func.count())
+        .where(table.c.submission_id.in_(submission_ids))
+        .group_by(table.c.submission_id),
+        execution_options=tier_options(archive),
+    )
+    return dict(rows.tuples().all())
+
+
+def iter_submission_rows(
+    chunk_size: int = EXPORT_CHUNK_SIZE, after_id: int | None = None, where=None, archive: bool = False
+) -> Iterator[dict]:
+    for chunk in _iter_submission_chunks(chunk_size, after_id, where, archive):
+        ids = [s.id for s in chunk]
+        yy_bots = _children_by_submission(YyBot.__table__, [_BOT_NAME], ids, archive)
+        withdraw_dates = _withdraw_dates_by_submission(ids, archive)
+        bot_counts = _counts_by_submission(SubsidyBot.__table__, ids, archive)
+
+        for s in chunk:
+            yy_names = [bot.bot_name for bot in yy_bots.get(s.id, ())]
+            yield {
+                "submission_id": s.id,
+                "created_at": s.created_at.isoformat() if s.created_at else "",
+                "uid": s.uid,
+                "s_level": s.s_level,
+                "missed_salary_amount": _amount(s.missed_salary_amount),
+                "owed_yy_bots": _yes_no(s.owed_yy_bots),
+                "yy_bot_count": len(yy_names),
+                "yy_bot_names": ", ".join(yy_names),
+                "owed_fortibots_tickets": _yes_no(s.owed_fortibots_tickets),
+                "fortibots_ticket_amount": _amount(s.fortibots_ticket_amount),
+                "pending_withdraws": _yes_no(s.pending_withdraws),
+                "withdraw_dates": ", ".join(withdraw_dates.get(s.id, ())),
+                "bot_count": bot_counts.get(s.id, 0),
+            }
+
+
+def iter_bot_rows(
+    chunk_size: int = EXPORT_CHUNK_SIZE, after_id: int | None = None, where=None, archive: bool = False
+) -> Iterator[dict]:
+    table = SubsidyBot.__table__
+    stmt = (
+        select(table.c.id, table.c.submission_id, _BOT_NAME, _cents(table.c.subsidy_amount))
+        .select_from(table.join(Bot.__table__))
+        .order_by(table.c.submission_id.asc(), table.c.id.asc())
+        .limit(chunk_size)
+    )
+    if after_id is not None:
+        stmt = stmt.where(table.c.submission_id > after_id)
+    if where is not None:
+        stmt = stmt.where(table.c.submission_id.in_(select(Submission.id).where(where)))
+
+    last_key = None
+    while True:
+        query = stmt
+        if last_key is not None:
+            query = query.where(tuple_(table.c.submission_id, table.c.id) > tuple_(*last_key))
+        chunk = db.session.execute(query, execution_options=tier_options(archive)).all()
+        if not chunk:
+            return
+
+        for b in chunk:
+            yield {
+                "submission_id": b.submission_id,
+                "bot_name": b.bot_name,
+                "subsidy_amount": _amount(b.subsidy_amount),
+            }
+        last_key = (chunk[-1].submission_id, chunk[-1].id)
+
+
+def iter_flat_rows(
+    chunk_size: int = EXPORT_CHUNK_SIZE, after_id: int | None = None, where=None, archive: bool = False
+) -> Iterator[dict]:
+    subsidy = SubsidyBot.__table__.c
+
+    for chunk in _iter_submission_chunks(chunk_size, after_id, where, archive):
+        ids = [s.id for s in chunk]
+        yy_bots = _children_by_submission(YyBot.__table__, [_BOT_NAME], ids, archive)
+        subsidy_bots = _children_by_submission(
+            SubsidyBot.__table__, [_BOT_NAME, _cents(subsidy.subsidy_amount)], ids, archive
+        )
+        withdraw_dates = _withdraw_dates_by_submission(ids, archive)
+
+        for s in chunk:
+            bots = subsidy_bots.get(s.id, ())
+            yield {
+                "submission_id": s.id,
+                "created_at": s.created_at.isoformat() if s.created_at else "",
+                "uid": s.uid,
+                "s_level": s.s_level,
+                "missed_salary_amount": _amount(s.missed_salary_amount),
+                "owed_yy_bots": _yes_no(s.owed_yy_bots),
+                "owed_fortibots_tickets": _yes_no(s.owed_fortibots_tickets),
+                "fortibots_ticket_amount": _amount(s.fortibots_ticket_amount),
+                "pending_withdraws": _yes_no(s.pending_withdraws),
+                "withdraw_dates": ", ".join(withdraw_dates.get(s.id, ())),
+                "yy_bot_names": ", ".join(bot.bot_name for bot in yy_bots.get(s.id, ())),
+                "yy_bot_name": "",
+                "bot_name": ", ".join(bot.bot_name for bot in bots),
+                "subsidy_amount": ", ".join(_amount(bot.subsidy_amount) for bot in bots),
+            }
+
+
+def iter_submission_records(
+    chunk_size: int = EXPORT_CHUNK_SIZE, after_id: int | None = None, where=None, archive: bool = False
+) -> Iterator[dict]:
+    """Lossless nested records (the bulk-ingest format plus id and created_at)."""
+    subsidy = SubsidyBot.__table__.c
+
+    for chunk in _iter_submission_chunks(chunk_size, after_id, where, archive):
+        ids = [s.id for s in chunk]
+        yy_bots = _children_by_submission(YyBot.__table__, [_BOT_NAME], ids, archive)
+        subsidy_bots = _children_by_submission(
+            SubsidyBot.__table__, [_BOT_NAME, _cents(subsidy.subsidy_amount)], ids, archive
+        )
+        withdraw_dates = _withdraw_dates_by_submission(ids, archive)
+
+        for s in chunk:
+            yield {
+                "submission_id": s.id,
+                "created_at": s.created_at.isoformat() if s.created_at else None,
+                "uid": s.uid,
+                "s_level": s.s_level,
+                "missed_salary_amount": _amount(s.missed_salary_amount) or None,
+                "owed_yy_bots": bool(s.owed_yy_bots),
+                "yy_bots": [bot.bot_name for bot in yy_bots.get(s.id, ())],
+                "owed_fortibots_tickets": bool(s.owed_fortibots_tickets),
+                "fortibots_ticket_amount": _amount(s.fortibots_ticket_amount) or None,
+                "pending_withdraws": bool(s.pending_withdraws),
+                "withdraw_dates": withdraw_dates.get(s.id, []),
+                "subsidy_bots": [
+                    {"bot_name": bot.bot_name, "subsidy_amount": _amount(bot.subsidy_amount)}
+                    for bot in subsidy_bots.get(s.id, ())
+                ],
+            }
+
+
+def iter_tiers(iter_rows, include_archive: bool = False, **kwargs) -> Iterator[dict]:
+    """``iter_rows(**kwargs)`` over the archive tier first (its rows are the oldest), then the live tables."""
+    if include_archive:
+        yield from iter_rows(archive=True, **kwargs)
+    yield from iter_rows(**kwargs)
+
+
+# kind -> (download name, row iterator, CSV columns)
+CSV_EXPORTS = {
+    "submissions": ("submissions.csv", iter_submission_rows, SUBMISSION_FIELDS),
+    "bots": ("subsidy_bots.csv", iter_bot_rows, BOT_FIELDS),
+    "flat": ("submissions_flat.csv", iter_flat_rows, FLAT_FIELDS),
+}
+
+
+def flat_row_to_record(row: dict) -> dict:
+    """Turn a flat.csv row back into a bulk-ingest record.
+
+    List columns are split on ", ", so bot names that themselves contain a
+    comma do not survive a CSV round trip; use NDJSON for lossless moves.
+    """
+
+    def split(value: str | None) -> list[str]:
+        return [part.strip() for part in (value or "").split(", ") if part.strip()]
+
+    names = split(row.get("bot_name"))
+    amounts = split(row.get("subsidy_amount"))
+    return {
+        "submission_id": int(row["submission_id"]) if row.get("submission_id") else None,
+        "created_at": row.get("created_at") or None,
+        "uid": row.get("uid"),
+        "s_level": row.get("s_level"),
+        "missed_salary_amount": row.get("missed_salary_amount") or None,
+        "owed_yy_bots": row.get("owed_yy_bots") == "yes",
+        "yy_bots": split(row.get("yy_bot_names")),
+        "owed_fortibots_tickets": row.get("owed_fortibots_tickets") == "yes",
+        "fortibots_ticket_amount": row.get("fortibots_ticket_amount") or None,
+        "pending_withdraws": row.get("pending_withdraws") == "yes",
+        "withdraw_dates": split(row.get("withdraw_dates")),
+        "subsidy_bots": [
+            {"bot_name": name, "subsidy_amount": amount} for name, amount in zip(names, amounts)
+        ],
+    }
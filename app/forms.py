@@ -17,11 +17,21 @@ from wtforms import (
 from wtforms.validators import DataRequired, Length, Optional, ValidationError, NumberRange, Regexp
 
 
+# Shared with the bulk ingest API so both paths enforce the same rules.
+UID_REGEX = r"^\d{7}$"
+UID_MESSAGE = "UID must be exactly 7 numbers."
+S_LEVELS = [f"S{level}" for level in range(9)]
+MAX_NAME_LENGTH = 128
+MAX_SUBSIDY_BOTS = 100
+MAX_YY_BOTS = 14
+MAX_WITHDRAW_DATES = 2
+
+
 class BotEntryForm(FlaskForm):
     class Meta:
         csrf = False
 
-    bot_name = StringField("Bot name", validators=[Optional(), Length(max=128)])
+    bot_name = StringField("Bot name", validators=[Optional(), Length(max=MAX_NAME_LENGTH)])
     subsidy_amount = DecimalField(
         "Subsidy amount",
         places=2,
@@ -35,13 +45,13 @@ class PublicSubmissionForm(FlaskForm):
         "UID",
         validators=[
             DataRequired(),
-            Length(min=7, max=7, message="UID must be exactly 7 numbers."),
-            Regexp(r"^\d{7}$", message="UID must be exactly 7 numbers."),
+            Length(min=7, max=7, message=UID_MESSAGE),
+            Regexp(UID_REGEX, message=UID_MESSAGE),
         ],
     )
     s_level = SelectField(
         "S Level",
-        choices=[(f"S{level}", f"S{level}") for level in range(9)],
+        choices=[(level, level) for level in S_LEVELS],
         validators=[DataRequired()],
     )
 
@@ -53,7 +63,11 @@ class PublicSubmissionForm(FlaskForm):
     )
 
     owed_yy_bots = BooleanField("Are you owed any YY bots?")
-    yy_bots = FieldList(StringField("YY bot name", validators=[Optional(), Length(max=128)]), min_entries=1, max_entries=14)
+    yy_bots = FieldList(
+        StringField("YY bot name", validators=[Optional(), Length(max=MAX_NAME_LENGTH)]),
+        min_entries=1,
+        max_entries=MAX_YY_BOTS,
+    )
 
     owed_fortibots_tickets = BooleanField("Are you owed any tickets for renting Fortibots?")
     fortibots_ticket_amount = DecimalField(
@@ -64,9 +78,13 @@ class PublicSubmissionForm(FlaskForm):
     )
 
     pending_withdraws = BooleanField("Did you initiate any withdraws that have not been processed yet?")
-    withdraw_dates = FieldList(DateField("Withdraw date", validators=[Optional()]), min_entries=1, max_entries=2)
+    withdraw_dates = FieldList(
+        DateField("Withdraw date", validators=[Optional()]),
+        min_entries=1,
+        max_entries=MAX_WITHDRAW_DATES,
+    )
 
-    subsidy_bots = FieldList(FormField(BotEntryForm), min_entries=1, max_entries=100)
+    subsidy_bots = FieldList(FormField(BotEntryForm), min_entries=1, max_entries=MAX_SUBSIDY_BOTS)
 
     submit = SubmitField("Submit")
 
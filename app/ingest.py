@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import Flask, current_app
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .models import Submission
+
+
+class SubmissionBatcher:
+    """Group-commit writer for public form submissions.
+
+    Request threads hand over fully built ``Submission`` objects and wait on the
+    returned future. A single writer thread drains the queue and commits up to
+    ``batch_size`` submissions per transaction, or whatever arrived within
+    ``interval_ms`` of the first one, so a burst costs one fsync per batch
+    instead of one per submission. Each submission is inserted under its own
+    SAVEPOINT, so a duplicate UID fails only that submission's future.
+    """
+
+    def __init__(self, app: Flask, batch_size: int = 100, interval_ms: int = 20) -> None:
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self._queue: queue.Queue[tuple[Submission, Future]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    def submit(self, submission: Submission) -> Future:
+        self._ensure_writer()
+        future: Future = Future()
+        self._queue.put((submission, future))
+        return future
+
+    def _ensure_writer(self) -> None:
+        # Started lazily and per process: a thread created before gunicorn
+        # forks its workers would not exist in the children.
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name="submission-batcher", daemon=True)
+            self._thread.start()
+            self._pid = pid
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch: list[tuple[Submission, Future]]) -> None:
+        outcomes: list[tuple[Future, int | None, Exception | None]] = []
+        with self.app.app_context():
+            try:
+                if db.engine.dialect.name == "sqlite":
+                    # pysqlite sends no BEGIN before a SAVEPOINT, which would make every
+                    # RELEASE commit on its own; open the transaction that groups the batch.
+                    db.session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+                for submission, future in batch:
+                    try:
+                        with db.session.begin_nested():
+                            db.session.add(submission)
+                    except IntegrityError as exc:
+                        outcomes.append((future, None, exc))
+                    else:
+                        outcomes.append((future, submission.id, None))
+                db.session.commit()
+            except Exception as exc:
+                db.session.rollback()
+                current_app.logger.exception("Submission batch of %d failed", len(batch))
+                for _, future in batch:
+                    future.set_exception(exc)
+                return
+
+        # Only acknowledge once the whole batch is durable.
+        for future, submission_id, exc in outcomes:
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(submission_id)
+
+
+def init_ingest(app: Flask) -> None:
+    if app.config["INGEST_MODE"] != "batched":
+        return
+
+    app.extensions["submission_batcher"] = SubmissionBatcher(
+        app,
+        batch_size=app.config["INGEST_BATCH_SIZE"],
+        interval_ms=app.config["INGEST_BATCH_INTERVAL_MS"],
+    )
+
+
+def get_batcher() -> SubmissionBatcher | None:
+    return current_app.extensions.get("submission_batcher")
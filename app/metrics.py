@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+
+from flask import Flask, Response, before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024**2, 10 * 1024**2, 100 * 1024**2)
+
+# name -> (type, help, buckets)
+METRICS: dict[str, tuple[str, str, tuple | None]] = {
+    "ais_http_requests_total": ("counter", "Requests handled, by endpoint and status code.", None),
+    "ais_http_request_duration_seconds": (
+        "histogram",
+        "Time from request start until the last byte of the response body was produced.",
+        LATENCY_BUCKETS,
+    ),
+    "ais_http_request_sql_statements": ("histogram", "SQL statements executed per request.", STATEMENT_BUCKETS),
+    "ais_http_request_db_seconds": ("histogram", "Time spent executing SQL per request.", LATENCY_BUCKETS),
+    "ais_http_request_template_seconds": ("histogram", "Time spent rendering templates per request.", LATENCY_BUCKETS),
+    "ais_http_response_size_bytes": ("histogram", "Response body size.", SIZE_BUCKETS),
+    "ais_background_sql_statements_total": ("counter", "SQL statements executed outside a request.", None),
+    "ais_background_db_seconds_total": ("counter", "Time spent executing SQL outside a request.", None),
+    "ais_rate_limit_rejections_total": (
+        "counter",
+        "Requests turned away before processing, by endpoint and reason (ip, uid, concurrency).",
+        None,
+    ),
+}
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """In-process counters and histograms rendered in Prometheus text format.
+
+    Each gunicorn worker keeps its own registry; a scrape shows the worker
+    that served it.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], _Histogram] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe_many(self, values: dict[str, float], **labels: str) -> None:
+        """Record several histogram observations sharing ``labels`` under one lock."""
+        label_key = tuple(sorted(labels.items()))
+        with self._lock:
+            for name, value in values.items():
+                histogram = self._histograms.get((name, label_key))
+                if histogram is None:
+                    histogram = self._histograms[(name, label_key)] = _Histogram(METRICS[name][2])
+                histogram.observe(value)
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (histogram.buckets, list(histogram.counts), histogram.sum)
+                for key, histogram in self._histograms.items()
+            }
+
+        lines: list[str] = []
+        for name, (kind, help_text, _) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+
+            for (metric, labels), (buckets, counts, total) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _RequestTimer:
+    """Per-request accumulator; kept on ``g`` and closed over by streamed bodies."""
+
+    __slots__ = ("endpoint", "started", "sql_statements", "sql_seconds", "template_seconds", "render_started")
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.render_started: list[float] = []
+
+
+def _record(registry: MetricsRegistry, timer: _RequestTimer, status: int, size: int) -> None:
+    registry.inc("ais_http_requests_total", endpoint=timer.endpoint, status=str(status))
+    registry.observe_many(
+        {
+            "ais_http_request_duration_seconds": time.perf_counter() - timer.started,
+            "ais_http_request_sql_statements": timer.sql_statements,
+            "ais_http_request_db_seconds": timer.sql_seconds,
+            "ais_http_request_template_seconds": timer.template_seconds,
+            "ais_http_response_size_bytes": size,
+        },
+        endpoint=timer.endpoint,
+    )
+
+
+def _counting(
+    registry: MetricsRegistry, timer: _RequestTimer, status: int, body: Iterable
+) -> Iterator[bytes | str]:
+    # Streamed responses (CSV exports) are only finished once the body is
+    # exhausted, so they are recorded here rather than in after_request.
+    size = 0
+    try:
+        for chunk in body:
+            size += len(chunk) if isinstance(chunk, bytes) else len(chunk.encode())
+            yield chunk
+    finally:
+        close = getattr(body, "close", None)
+        if close is not None:
+            close()
+        _record(registry, timer, status, size)
+
+
+def _current_timer() -> _RequestTimer | None:
+    return g.get("_metrics_timer") if has_request_context() else None
+
+
+def instrument_engine(engine: Engine, registry: MetricsRegistry) -> None:
+    """Count statements and time spent in the DBAPI cursor for ``engine``."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["_metrics_started"].pop()
+        timer = _current_timer()
+        if timer is None:
+            registry.inc("ais_background_sql_statements_total")
+            registry.inc("ais_background_db_seconds_total", elapsed)
+            return
+        timer.sql_statements += 1
+        timer.sql_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        started = exception_context.connection.info.get("_metrics_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+def init_metrics(app: Flask, engine: Engine) -> None:
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    registry = MetricsRegistry()
+    app.extensions["metrics"] = registry
+    instrument_engine(engine, registry)
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_timer = _RequestTimer(request.endpoint or "unmatched")
+
+    @app.after_request
+    def _finish_timer(response: Response) -> Response:
+        # Left on g: streamed bodies still run SQL under this request context.
+        timer = g.get("_metrics_timer")
+        if timer is None:
+            return response
+        size = response.content_length
+        if size is None and response.is_streamed and not response.direct_passthrough:
+            response.response = _counting(registry, timer, response.status_code, response.response)
+        else:
+            _record(registry, timer, response.status_code, size or 0)
+        return response
+
+    def _render_started(sender, template, context, **extra):
+        timer = _current_timer()
+        if timer is not None:
+            timer.render_started.append(time.perf_counter())
+
+    def _render_finished(sender, template, context, **extra):
+        timer = _current_timer()
+        if timer is not None and timer.render_started:
+            timer.template_seconds += time.perf_counter() - timer.render_started.pop()
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
+
+
+def get_registry(app: Flask) -> MetricsRegistry | None:
+    return app.extensions.get("metrics")
@@ -1,20 +1,73 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
 
 from flask_login import UserMixin
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from . import db, login_manager
+from .user_cache import UserSnapshot, get_user_cache, password_fingerprint
+
+
+def split_withdraw_dates(value: str | None) -> list[str]:
+    if not value:
+        return []
+    return [entry.strip() for entry in value.split(",") if entry.strip()]
+
+
+def format_cents(cents: int) -> str:
+    """Render an integer cent amount as it would print as a 2-place Decimal."""
+    sign = "-" if cents < 0 else ""
+    whole, fraction = divmod(abs(cents), 100)
+    return f"{sign}{whole}.{fraction:02d}"
+
+
+class Cents(db.TypeDecorator):
+    """Money stored as an integer number of cents, exposed as a 2-place Decimal.
+
+    SQLite has no fixed-point type, so Numeric columns round-trip through
+    floats; integers keep SUM() exact and are cheap to load.
+    """
+
+    impl = db.Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return int((Decimal(str(value)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return Decimal(value).scaleb(-2)
 
 
 @login_manager.user_loader
-def load_user(user_id: str):
+def load_user(session_id: str):
+    """Resolve ``"<id>:<password fingerprint>"`` to a UserSnapshot, from the cache when possible.
+
+    A session whose fingerprint no longer matches (the password changed) is
+    treated as logged out.
+    """
     try:
-        return db.session.get(User, int(user_id))
-    except Exception:
+        user_id, fingerprint = session_id.split(":", 1)
+        user_id = int(user_id)
+    except ValueError:
         return None
 
+    cache = get_user_cache()
+    snapshot = cache.get(user_id) if cache else None
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot(user.id, user.username, password_fingerprint(user.password_hash))
+        if cache:
+            cache.put(snapshot)
+    return snapshot if snapshot.fingerprint == fingerprint else None
+
 
 class User(db.Model, UserMixin):
     __tablename__ = "users"
@@ -30,24 +83,28 @@ class User(db.Model, UserMixin):
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
 
+    def get_id(self) -> str:
+        return f"{self.id}:{password_fingerprint(self.password_hash)}"
+
 
 class Submission(db.Model):
     __tablename__ = "submissions"
+    # Ids are never handed out twice, even after the newest rows are archived or deleted.
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = db.Column(db.Integer, primary_key=True)
 
-    uid = db.Column(db.String(128), nullable=False, index=True)
+    uid = db.Column(db.String(128), nullable=False, unique=True, index=True)
     s_level = db.Column(db.String(32), nullable=False, index=True)
 
-    missed_salary_amount = db.Column(db.Numeric(12, 2), nullable=True)
+    missed_salary_amount = db.Column(Cents, nullable=True)
 
     owed_yy_bots = db.Column(db.Boolean, nullable=False, default=False)
     rented_more_than_2_yy_bots = db.Column(db.Boolean, nullable=False, default=False)
 
     owed_fortibots_tickets = db.Column(db.Boolean, nullable=False, default=False)
-    fortibots_ticket_amount = db.Column(db.Numeric(12, 2), nullable=True)
+    fortibots_ticket_amount = db.Column(Cents, nullable=True)
     pending_withdraws = db.Column(db.Boolean, nullable=False, default=False)
-    withdraw_dates = db.Column(db.String(255), nullable=True)
 
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
 
@@ -65,30 +122,175 @@ class Submission(db.Model):
         lazy="selectin",
     )
 
+    withdraw_dates = db.relationship(
+        "WithdrawDate",
+        back_populates="submission",
+        cascade="all, delete-orphan",
+        lazy="selectin",
+        order_by="WithdrawDate.id",
+    )
+
     def withdraw_dates_list(self) -> list[str]:
-        if not self.withdraw_dates:
-            return []
-        return [entry.strip() for entry in self.withdraw_dates.split(",") if entry.strip()]
+        return [entry.withdraw_date.isoformat() for entry in self.withdraw_dates]
+
+
+# Trigram index over lower(submissions.uid) for substring search. It is kept
+# in sync by SQLite triggers installed by the baseline migration in db_migrations.
+submission_uid_trigrams = db.Table(
+    "submission_uid_trigrams",
+    db.Column("trigram", db.String(3), primary_key=True),
+    db.Column("submission_id", db.Integer, primary_key=True),
+    sqlite_with_rowid=False,
+)
+
+
+# UIDs of submissions moved to the archive database (app/archive.py). A
+# trigger rejects new submissions that reuse one, so a UID stays unique
+# across both tiers without touching the archive on every insert.
+archived_uids = db.Table(
+    "archived_uids",
+    db.Column("uid", db.String(128), primary_key=True),
+    sqlite_with_rowid=False,
+)
+
+
+class Bot(db.Model):
+    """Interned bot names; subsidy and YY bot rows reference them by id."""
+
+    __tablename__ = "bots"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Case-folded, whitespace-collapsed name; see bots.canonical_bot_name().
+    key = db.Column(db.String(128), nullable=False, unique=True)
+    # Spelling of the first submission that used this bot.
+    name = db.Column(db.String(128), nullable=False)
+
+
+class _InternedBotName:
+    """``bot_name`` accessor for rows that store a ``bot_id``.
+
+    An assigned name is resolved to its bots row (created if needed) when the
+    session flushes, in the same transaction; see bots.resolve_bot_ids().
+    """
+
+    _pending_bot_name: str | None = None
 
+    @property
+    def bot_name(self) -> str:
+        if self._pending_bot_name is not None:
+            return " ".join(self._pending_bot_name.split())
+        return self.bot.name
 
-class SubsidyBot(db.Model):
+    @bot_name.setter
+    def bot_name(self, value: str) -> None:
+        self._pending_bot_name = value
+
+
+class SubsidyBot(_InternedBotName, db.Model):
     __tablename__ = "subsidy_bots"
+    # Covers the per-bot GROUP BY of the bots report.
+    __table_args__ = (db.Index("ix_subsidy_bots_bot_id", "bot_id", "subsidy_amount"),)
 
     id = db.Column(db.Integer, primary_key=True)
     submission_id = db.Column(db.Integer, db.ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False, index=True)
 
-    bot_name = db.Column(db.String(128), nullable=False)
-    subsidy_amount = db.Column(db.Numeric(12, 2), nullable=False)
+    bot_id = db.Column(db.Integer, db.ForeignKey("bots.id"), nullable=False)
+    subsidy_amount = db.Column(Cents, nullable=False)
 
     submission = db.relationship("Submission", back_populates="subsidy_bots")
+    bot = db.relationship("Bot", lazy="joined")
 
 
-class YyBot(db.Model):
+class YyBot(_InternedBotName, db.Model):
     __tablename__ = "yy_bots"
 
     id = db.Column(db.Integer, primary_key=True)
     submission_id = db.Column(db.Integer, db.ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False, index=True)
 
-    bot_name = db.Column(db.String(128), nullable=False)
+    bot_id = db.Column(db.Integer, db.ForeignKey("bots.id"), nullable=False)
 
     submission = db.relationship("Submission", back_populates="yy_bots")
+    bot = db.relationship("Bot", lazy="joined")
+
+
+class WithdrawDate(db.Model):
+    __tablename__ = "withdraw_dates"
+    # (date, submission) so date-range filters are answered from the index alone.
+    __table_args__ = (db.Index("ix_withdraw_dates_withdraw_date", "withdraw_date", "submission_id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    withdraw_date = db.Column(db.Date, nullable=False)
+
+    submission = db.relationship("Submission", back_populates="withdraw_dates")
+
+
+class SubmissionStats(db.Model):
+    """Running per-S-level totals, kept current by triggers on the data tables."""
+
+    __tablename__ = "submission_stats"
+
+    s_level = db.Column(db.String(32), primary_key=True)
+    submission_count = db.Column(db.Integer, nullable=False, default=0)
+    missed_salary_total = db.Column(Cents, nullable=False, default=0)
+    fortibots_ticket_total = db.Column(Cents, nullable=False, default=0)
+    subsidy_total = db.Column(Cents, nullable=False, default=0)
+    subsidy_bot_count = db.Column(db.Integer, nullable=False, default=0)
+    yy_bot_count = db.Column(db.Integer, nullable=False, default=0)
+    pending_withdraw_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DataVersion(db.Model):
+    """Single-row change counter, bumped by triggers on every submissions write.
+
+    Child rows are only ever written together with their submission, so the
+    counter covers them too. Export caching keys on it.
+    """
+
+    __tablename__ = "data_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    counter = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class ExportJob(db.Model):
+    """A CSV export written in the background; see app/export_jobs.py."""
+
+    __tablename__ = "export_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    withdraw_from = db.Column(db.Date)
+    withdraw_to = db.Column(db.Date)
+    include_archive = db.Column(db.Boolean, nullable=False, default=False)
+    # queued -> running -> done | failed
+    status = db.Column(db.String(16), nullable=False, default="queued")
+    rows_total = db.Column(db.Integer)
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    data_version = db.Column(db.Integer)
+    path = db.Column(db.String(512))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    finished_at = db.Column(db.DateTime)
+
+
+class SubmissionChange(db.Model):
+    """Append-only log of submissions writes for the incremental change feed.
+
+    Rows are written by triggers on submissions (see app/db_migrations.py),
+    so every write path is covered. ``seq`` is AUTOINCREMENT and never
+    reused, which makes it a stable cursor; deletes stay here as tombstones.
+    """
+
+    __tablename__ = "submission_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = db.Column(db.Integer, primary_key=True)
+    # No foreign key: a tombstone outlives its submission.
+    submission_id = db.Column(db.Integer, nullable=False)
+    # insert | update | delete | archive (moved to the archive tier)
+    op = db.Column(db.String(8), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_, delete, func, select, text
+from sqlalchemy.sql.elements import ColumnElement
+
+from . import db
+from .models import Submission, SubsidyBot, WithdrawDate, YyBot
+from .search import uid_search_clause
+
+
+# Submissions removed per DELETE statement and transaction. Child rows go with
+# them through ON DELETE CASCADE; keeping each write short lets public form
+# submissions interleave with a large purge.
+DELETE_BATCH_SIZE = 1000
+
+
+def submission_filter(
+    ids: Iterable[int] = (),
+    q: str = "",
+    created_from: date | None = None,
+    created_to: date | None = None,
+    s_level: str = "",
+) -> ColumnElement[bool] | None:
+    """AND of the given criteria, or None when nothing was given.
+
+    ``q`` is a UID pattern as in the dashboard search; ``created_to`` is inclusive.
+    """
+    clauses = []
+    ids = list(ids)
+    if ids:
+        clauses.append(Submission.id.in_(ids))
+    if q:
+        clauses.append(uid_search_clause(q))
+    if created_from:
+        clauses.append(Submission.created_at >= datetime.combine(created_from, time.min))
+    if created_to:
+        clauses.append(Submission.created_at < datetime.combine(created_to + timedelta(days=1), time.min))
+    if s_level:
+        clauses.append(Submission.s_level == s_level)
+    if not clauses:
+        return None
+    return and_(*clauses)
+
+
+def count_submissions(where: ColumnElement[bool]) -> dict[str, int]:
+    """Dry run: how many submissions and child rows a delete with ``where`` would remove."""
+    matching = select(Submission.id).where(where)
+    counts = {"submissions": db.session.scalar(select(func.count()).select_from(Submission).where(where))}
+    for name, model in (("subsidy_bots", SubsidyBot), ("yy_bots", YyBot), ("withdraw_dates", WithdrawDate)):
+        counts[name] = db.session.scalar(
+            select(func.count()).select_from(model).where(model.submission_id.in_(matching))
+        )
+    return counts
+
+
+def _foreign_keys_enforced() -> bool:
+    if db.engine.dialect.name != "sqlite":
+        return True
+    return bool(db.session.execute(text("PRAGMA foreign_keys")).scalar())
+
+
+def delete_submissions(where: ColumnElement[bool], batch_size: int = DELETE_BATCH_SIZE) -> int:
+    """Delete every submission matching ``where`` with set-based DELETEs; returns the count.
+
+    Commits after each batch. Bot and withdraw date rows are removed by the
+    foreign key cascade and the stats, trigram and data version triggers fire
+    per row, so nothing is loaded into the session.
+    """
+    if not _foreign_keys_enforced():
+        raise RuntimeError("SQLite foreign_keys is off; child rows would be left behind.")
+
+    deleted = 0
+    while True:
+        batch = select(Submission.id).where(where).limit(batch_size)
+        result = db.session.execute(
+            delete(Submission).where(Submission.id.in_(batch)),
+            execution_options={"synchronize_session": False},
+        )
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
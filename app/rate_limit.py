@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Flask, Response, current_app, g, request
+
+from .metrics import get_registry
+from .search import UID_PATTERN
+
+
+# Endpoints (and methods) guarded before CSRF checks and any query.
+LIMITED_ENDPOINTS = {("public.index", "POST")}
+
+# How often each worker deletes buckets that have refilled completely (and lapsed leases).
+PRUNE_INTERVAL = 300.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rate_limit_slots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_rate_limit_slots_expires_at ON rate_limit_slots (expires_at);
+"""
+
+# Refill since the last request, capped at the burst size, then take one token if
+# there is one. A rejected request changes nothing and returns no row.
+_TAKE = """
+INSERT INTO rate_limit_buckets (key, tokens, updated_at) VALUES (:key, :burst - 1, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:burst, tokens + max(0, :now - updated_at) * :rate) - 1,
+    updated_at = :now
+WHERE min(:burst, tokens + max(0, :now - updated_at) * :rate) >= 1
+RETURNING tokens
+"""
+
+_LEVEL = "SELECT min(:burst, tokens + max(0, :now - updated_at) * :rate) FROM rate_limit_buckets WHERE key = :key"
+
+# One statement, so the count and the insert happen under the same write lock. A
+# lease of a worker that died before releasing it stops counting at expires_at.
+_LEASE = """
+INSERT INTO rate_limit_slots (expires_at)
+SELECT :now + :ttl WHERE (SELECT count(*) FROM rate_limit_slots WHERE expires_at > :now) < :limit
+RETURNING id
+"""
+
+
+class TokenBuckets:
+    """Token buckets and concurrency leases in a small SQLite file shared by every worker.
+
+    Each bucket holds up to ``burst`` tokens and refills at ``rate`` per
+    second; a request takes one. The file holds nothing worth keeping, so it
+    skips fsync; if it cannot be written in time the request is let through.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._next_prune = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.executescript(_SCHEMA)
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=0.25, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=OFF")
+        return connection
+
+    def _connection(self) -> sqlite3.Connection:
+        # Per thread and per process: never reuse a connection across a fork.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return connection
+
+    def take(self, key: str, burst: int, rate: float) -> float:
+        """Take a token from ``key``'s bucket; returns 0, or the seconds until one is available."""
+        now = time.time()
+        params = {"key": key, "burst": burst, "rate": rate, "now": now}
+        try:
+            connection = self._connection()
+            # fetchall: the statement (and its write lock) ends before returning.
+            if connection.execute(_TAKE, params).fetchall():
+                return 0.0
+            level = connection.execute(_LEVEL, params).fetchall()
+        except sqlite3.Error:
+            current_app.logger.warning("Rate limit store unavailable; request allowed.", exc_info=True)
+            return 0.0
+        tokens = level[0][0] if level else 0.0
+        return (1 - tokens) / rate if rate > 0 else float("inf")
+
+    def lease(self, limit: int, ttl: float) -> int | None:
+        """Take one of ``limit`` slots shared by all workers for at most ``ttl`` seconds.
+
+        Returns the lease id to release, None when every slot is taken, or 0
+        (nothing to release) when the file is unavailable.
+        """
+        params = {"limit": limit, "ttl": ttl, "now": time.time()}
+        try:
+            rows = self._connection().execute(_LEASE, params).fetchall()
+        except sqlite3.Error:
+            current_app.logger.warning("Rate limit store unavailable; request allowed.", exc_info=True)
+            return 0
+        return rows[0][0] if rows else None
+
+    def release(self, lease: int) -> None:
+        try:
+            self._connection().execute("DELETE FROM rate_limit_slots WHERE id = ?", (lease,))
+        except sqlite3.Error:
+            # The lease lapses on its own once it expires.
+            current_app.logger.warning("Could not release a rate limit slot.", exc_info=True)
+
+    def prune(self, idle: float) -> None:
+        """Forget lapsed leases and buckets idle for ``idle`` seconds (full again); at most every PRUNE_INTERVAL."""
+        now = time.time()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + PRUNE_INTERVAL
+        try:
+            connection = self._connection()
+            connection.execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - idle,))
+            connection.execute("DELETE FROM rate_limit_slots WHERE expires_at < ?", (now,))
+        except sqlite3.Error:
+            current_app.logger.warning("Could not prune rate limit buckets.", exc_info=True)
+
+
+class RateLimiter:
+    """Load shedding for the public submission endpoint.
+
+    A cap on requests in progress across all workers answers 503 at once
+    when the site is busy; per-IP and per-UID token buckets answer 429. Both come
+    with ``Retry-After`` and run before CSRF validation, WTForms or SQL. The
+    cap and the IP bucket do not touch the request body; only a request that
+    passes them has its form parsed for the UID bucket.
+    """
+
+    def __init__(self, buckets: TokenBuckets, config) -> None:
+        self.buckets = buckets
+        self.ip_limit = (config["RATE_LIMIT_IP_BURST"], config["RATE_LIMIT_IP_PER_MINUTE"] / 60)
+        self.uid_limit = (config["RATE_LIMIT_UID_BURST"], config["RATE_LIMIT_UID_PER_MINUTE"] / 60)
+        # Seconds after which an untouched bucket of either kind is full again.
+        self._idle = max(burst / rate if rate > 0 else 86400.0 for burst, rate in (self.ip_limit, self.uid_limit))
+        self.max_concurrent = config["RATE_LIMIT_MAX_CONCURRENT"]
+        self.slot_ttl = config["RATE_LIMIT_SLOT_TTL"]
+
+    def check(self) -> Response | None:
+        if self.max_concurrent > 0:
+            lease = self.buckets.lease(self.max_concurrent, self.slot_ttl)
+            if lease is None:
+                return _rejected("concurrency", 503, 1, "The server is busy. Please try again in a moment.")
+            g._rate_limit_lease = lease
+
+        wait = self.buckets.take(f"ip:{request.remote_addr}", *self.ip_limit)
+        if wait:
+            return _rejected("ip", 429, wait, "Too many submissions from your network. Please try again later.")
+
+        # Parses the whole body (cached for CSRF and WTForms), so it comes after the cheap checks.
+        uid = (request.form.get("uid") or "").strip()
+        if UID_PATTERN.match(uid):
+            wait = self.buckets.take(f"uid:{uid}", *self.uid_limit)
+            if wait:
+                return _rejected("uid", 429, wait, "Too many submissions for this UID. Please try again later.")
+        self.buckets.prune(self._idle)
+        return None
+
+    def release(self) -> None:
+        lease = g.pop("_rate_limit_lease", None)
+        if lease:
+            self.buckets.release(lease)
+
+
+def _rejected(reason: str, status: int, retry_after: float, message: str) -> Response:
+    registry = get_registry(current_app)
+    if registry is not None:
+        registry.inc("ais_rate_limit_rejections_total", endpoint=request.endpoint, reason=reason)
+    response = Response(message, status=status, mimetype="text/plain")
+    response.retry_after = max(1, math.ceil(min(retry_after, 86400)))
+    response.cache_control.no_store = True
+    return response
+
+
+def init_rate_limit(app: Flask) -> None:
+    if not app.config["RATE_LIMIT_ENABLED"]:
+        return
+
+    limiter = RateLimiter(TokenBuckets(app.config["RATE_LIMIT_DATABASE_PATH"]), app.config)
+    app.extensions["rate_limit"] = limiter
+
+    def _limit():
+        if (request.endpoint, request.method) in LIMITED_ENDPOINTS:
+            return limiter.check()
+        return None
+
+    # First of all before_request hooks: CSRFProtect's parses the whole form.
+    app.before_request_funcs.setdefault(None, []).insert(0, _limit)
+
+    @app.teardown_request
+    def _release(exc):
+        limiter.release()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import fcntl
+import os
+import sqlite3
+import time
+from functools import wraps
+
+from flask import Flask, current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+from .sqlite_tuning import connection_pragmas, is_sqlite_file
+
+
+class SnapshotSession(Session):
+    """``db.session`` that sends a request's queries to the read snapshot
+    engine while the view is wrapped in :func:`read_snapshot`."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            snapshot = g.get("_read_snapshot")
+            if snapshot is not None:
+                return snapshot.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReadSnapshot:
+    """Read-only engine for admin reports, separate from the primary pool.
+
+    ``wal`` opens the live database read-only and runs each request in one
+    read transaction: a consistent view that never blocks writers. ``copy``
+    reads a copy made with SQLite's online backup API, refreshed (by one
+    process at a time) once it is older than ``max_staleness`` seconds and
+    the data has changed; a local stand-in for a read replica.
+    """
+
+    def __init__(self, mode: str, database: str, copy_path: str, max_staleness: float, pragmas: list[str]) -> None:
+        self.mode = mode
+        self.database = database
+        self.copy_path = copy_path
+        self.max_staleness = max_staleness
+        self._inode: int | None = None
+        source = database if mode == "wal" else copy_path
+        # Read-only URI so a stray write fails instead of touching the file.
+        self.engine = create_engine(f"sqlite:///file:{source}?mode=ro&uri=true")
+        _read_only_transactions(self.engine, pragmas)
+
+    def ensure_fresh(self) -> None:
+        if self.mode != "copy":
+            return
+        if self._age() > self.max_staleness:
+            with open(f"{self.copy_path}.lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # Another worker may have refreshed it while we waited.
+                if self._age() > self.max_staleness:
+                    self._refresh()
+        inode = os.stat(self.copy_path).st_ino
+        if inode != self._inode:
+            # Pooled connections still read the replaced file.
+            self.engine.dispose()
+            self._inode = inode
+
+    def _age(self) -> float:
+        try:
+            return time.time() - os.stat(self.copy_path).st_mtime
+        except FileNotFoundError:
+            return float("inf")
+
+    def _refresh(self) -> None:
+        source = sqlite3.connect(self.database)
+        try:
+            if os.path.exists(self.copy_path) and _counter(source) == _counter_of(self.copy_path):
+                os.utime(self.copy_path)
+                return
+            temp_path = f"{self.copy_path}.{os.getpid()}.tmp"
+            target = sqlite3.connect(temp_path)
+            try:
+                source.backup(target)
+                target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                target.close()
+            os.replace(temp_path, self.copy_path)
+        finally:
+            source.close()
+
+
+def _counter(connection: sqlite3.Connection) -> int | None:
+    try:
+        row = connection.execute("SELECT counter FROM data_version WHERE id = 1").fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def _counter_of(path: str) -> int | None:
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return _counter(connection)
+    finally:
+        connection.close()
+
+
+def _read_only_transactions(engine: Engine, pragmas: list[str]) -> None:
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy's begin below open the transaction, reads included.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in ["PRAGMA query_only=ON", *pragmas]:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+
+def read_snapshot(view):
+    """Run ``view``'s queries (and any streamed body) on the read snapshot, when configured."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        snapshot = current_app.extensions.get("read_snapshot")
+        if snapshot is not None:
+            snapshot.ensure_fresh()
+            g._read_snapshot = snapshot
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def init_read_snapshot(app: Flask) -> None:
+    mode = app.config["READ_SNAPSHOT"]
+    if not mode:
+        return
+    if mode not in ("wal", "copy"):
+        raise ValueError(f"READ_SNAPSHOT must be 'wal', 'copy' or empty, not {mode!r}")
+    uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    if not is_sqlite_file(uri):
+        app.logger.warning("READ_SNAPSHOT needs a file-backed SQLite database; reads stay on the primary.")
+        return
+
+    if mode == "wal" and not (app.config["SQLITE_TUNING"] and app.config["SQLITE_JOURNAL_MODE"].lower() == "wal"):
+        app.logger.warning("READ_SNAPSHOT=wal without the WAL profile: snapshot reads will block writers.")
+
+    pragmas = [pragma for pragma in connection_pragmas(app.config) if "journal_mode" not in pragma]
+    snapshot = ReadSnapshot(
+        mode,
+        make_url(uri).database,
+        app.config["READ_SNAPSHOT_PATH"],
+        app.config["READ_SNAPSHOT_MAX_STALENESS"],
+        pragmas,
+    )
+    app.extensions["read_snapshot"] = snapshot
+
+    if "archive" in app.extensions:
+        from .archive import attach_archive
+
+        # The archive itself is only written by `flask archive`; read it in place.
+        attach_archive(snapshot.engine, f"file:{app.extensions['archive']}?mode=ro")
+
+    from .metrics import get_registry, instrument_engine
+
+    registry = get_registry(app)
+    if registry is not None:
+        instrument_engine(snapshot.engine, registry)
@@ -1,14 +1,48 @@
 from __future__ import annotations
 
-import csv
-from io import StringIO
-
-from flask import Blueprint, flash, redirect, render_template, request, url_for, Response
+import io
+import json
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import (
+    Blueprint,
+    abort,
+    current_app,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    url_for,
+    Response,
+    stream_with_context,
+)
 from flask_login import current_user, login_required, login_user, logout_user
-
-from . import db
-from .forms import PublicSubmissionForm, LoginForm
-from .models import Submission, SubsidyBot, User, YyBot
+from sqlalchemy import func, literal, select, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from . import csrf, db
+from .archive import archive_enabled, tier_options
+from .bulk import ingest_lines
+from .changes import change_window, iter_changes
+from .db_migrations import unique_uid_enforced
+from .export_cache import data_version, export_variant, get_export_cache
+from .export_jobs import get_export_jobs, job_status
+from .exports import CSV_EXPORTS, iter_csv, iter_tiers
+from .forms import S_LEVELS, PublicSubmissionForm, LoginForm
+from .ingest import get_batcher
+from .metrics import get_registry
+from .models import ExportJob, Submission, SubsidyBot, User, WithdrawDate, YyBot
+from .purge import count_submissions, delete_submissions, submission_filter
+from .read_snapshot import read_snapshot
+from .search import UID_PATTERN, uid_search_clause, withdraw_date_clause
+from .stats import bot_report, level_stats
+from .uid_index import get_uid_index
 
 
 public_bp = Blueprint("public", __name__)
@@ -24,13 +58,9 @@ def index():
         form.subsidy_bots.append_entry()
 
     if form.validate_on_submit():
-        existing_submission = Submission.query.filter_by(uid=form.uid.data.strip()).first()
-        if existing_submission:
-            form.uid.errors.append("UID already exists. Please use a unique UID.")
-            return render_template("public_form.html", form=form)
-
+        uid = form.uid.data.strip()
         submission = Submission(
-            uid=form.uid.data.strip(),
+            uid=uid,
             s_level=form.s_level.data,
             missed_salary_amount=form.missed_salary_amount.data,
             owed_yy_bots=bool(form.owed_yy_bots.data),
@@ -38,14 +68,12 @@ def index():
             owed_fortibots_tickets=bool(form.owed_fortibots_tickets.data),
             fortibots_ticket_amount=form.fortibots_ticket_amount.data,
             pending_withdraws=bool(form.pending_withdraws.data),
-            withdraw_dates=", ".join(
-                entry.data.isoformat()
-                for entry in form.withdraw_dates.entries
-                if entry.data is not None
-            )
-            or None,
         )
 
+        for entry in form.withdraw_dates.entries:
+            if entry.data is not None:
+                submission.withdraw_dates.append(WithdrawDate(withdraw_date=entry.data))
+
         # Add bots (only rows with bot_name)
         for entry in form.subsidy_bots.entries:
             name = (entry.form.bot_name.data or "").strip()
@@ -59,14 +87,48 @@ def index():
                 if name:
                     submission.yy_bots.append(YyBot(bot_name=name))
 
-        db.session.add(submission)
-        db.session.commit()
+        # The unique index on uid is the duplicate check: one INSERT, no pre-SELECT,
+        # unless duplicated UIDs kept the index from being created.
+        if not unique_uid_enforced():
+            # Not on db.session: the pooled connection would stay checked out while the batcher commits.
+            with db.engine.connect() as connection:
+                taken = connection.scalar(select(Submission.id).where(Submission.uid == uid).limit(1))
+            if taken:
+                form.uid.errors.append("UID already exists. Please use a unique UID.")
+                return render_template("public_form.html", form=form)
+
+        try:
+            batcher = get_batcher()
+            if batcher is not None:
+                batcher.submit(submission).result(timeout=current_app.config["INGEST_COMMIT_TIMEOUT"])
+            else:
+                db.session.add(submission)
+                db.session.commit()
+        except IntegrityError as exc:
+            db.session.rollback()
+            if "submissions.uid" not in str(exc.orig):
+                raise
+            get_uid_index().add(uid)
+            form.uid.errors.append("UID already exists. Please use a unique UID.")
+            return render_template("public_form.html", form=form)
+        except FutureTimeoutError:
+            abort(503)
 
+        get_uid_index().add(uid)
         return redirect(url_for("public.thanks"))
 
     return render_template("public_form.html", form=form)
 
 
+@public_bp.route("/api/uid-available")
+def uid_available():
+    """Live duplicate check for the form's UID field (advisory; the unique index decides)."""
+    uid = (request.args.get("uid") or "").strip()
+    if not UID_PATTERN.match(uid):
+        return jsonify(uid=uid, valid=False, available=None)
+    return jsonify(uid=uid, valid=True, available=get_uid_index().is_available(uid))
+
+
 @public_bp.route("/thanks")
 def thanks():
     return render_template("thanks.html")
@@ -96,162 +158,399 @@ def logout():
     return redirect(url_for("admin.login"))
 
 
+DASHBOARD_MAX_PAGE_SIZE = 500
+
+
+def _encode_cursor(created_at: datetime, submission_id: int) -> str:
+    return f"{created_at.isoformat()}_{submission_id}"
+
+
+def _decode_cursor(value: str | None) -> tuple[datetime, int] | None:
+    if not value:
+        return None
+    try:
+        created_at, submission_id = value.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(submission_id)
+    except ValueError:
+        return None
+
+
+def _date_arg(name: str) -> date | None:
+    value = (request.values.get(name) or "").strip()
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, description=f"{name} must be a YYYY-MM-DD date.")
+
+
+def _include_archive() -> bool:
+    """The dashboard's "include archive" toggle (``archive=1``), when an archive is configured."""
+    return request.values.get("archive") == "1" and archive_enabled()
+
+
+def _page_size() -> int:
+    default = current_app.config["DASHBOARD_PAGE_SIZE"]
+    per_page = request.args.get("per_page", default, type=int)
+    return max(1, min(per_page, DASHBOARD_MAX_PAGE_SIZE))
+
+
+def _dashboard_rows(q, withdraw_from, withdraw_to, per_page, before, after, archive: bool = False) -> list:
+    """Up to ``per_page + 1`` dashboard rows next to the cursor, newest first, from one tier."""
+    sort_key = tuple_(Submission.created_at, Submission.id)
+    page = select(
+        Submission.id, Submission.created_at, Submission.uid, Submission.s_level, literal(archive).label("archived")
+    )
+    if q:
+        page = page.where(uid_search_clause(q))
+    withdraw_filter = withdraw_date_clause(Submission.id, withdraw_from, withdraw_to)
+    if withdraw_filter is not None:
+        page = page.where(withdraw_filter)
+
+    # Keyset pagination: walking backwards from an "after" cursor reads the
+    # rows just above it in ascending order, then the page is flipped below.
+    if after:
+        page = page.where(sort_key > tuple_(*after)).order_by(Submission.created_at.asc(), Submission.id.asc())
+    else:
+        if before:
+            page = page.where(sort_key < tuple_(*before))
+        page = page.order_by(Submission.created_at.desc(), Submission.id.desc())
+    page = page.limit(per_page + 1).cte("page")
+
+    bot_counts = (
+        select(SubsidyBot.submission_id, func.count().label("bot_count"))
+        .where(SubsidyBot.submission_id.in_(select(page.c.id)))
+        .group_by(SubsidyBot.submission_id)
+        .subquery()
+    )
+    return db.session.execute(
+        select(page, func.coalesce(bot_counts.c.bot_count, 0).label("bot_count"))
+        .outerjoin(bot_counts, bot_counts.c.submission_id == page.c.id)
+        .order_by(page.c.created_at.desc(), page.c.id.desc()),
+        execution_options=tier_options(archive),
+    ).all()
+
+
 @admin_bp.route("/", methods=["GET"])
 @login_required
 def dashboard():
     q = (request.args.get("q") or "").strip()
-
-    query = Submission.query
-    if q:
-        query = query.filter(Submission.uid.ilike(f"%{q}%"))
-
-    submissions = query.order_by(Submission.created_at.desc()).limit(500).all()
-    return render_template("admin_dashboard.html", submissions=submissions, q=q)
+    withdraw_from = _date_arg("withdraw_from")
+    withdraw_to = _date_arg("withdraw_to")
+    per_page = _page_size()
+    before = _decode_cursor(request.args.get("before"))
+    after = None if before else _decode_cursor(request.args.get("after"))
+    include_archive = _include_archive()
+
+    rows = _dashboard_rows(q, withdraw_from, withdraw_to, per_page, before, after)
+    if include_archive:
+        # Each tier returns its own per_page + 1 rows nearest the cursor; keep
+        # the overall nearest so the pager logic below applies unchanged.
+        archived = _dashboard_rows(q, withdraw_from, withdraw_to, per_page, before, after, archive=True)
+        rows = sorted(rows + archived, key=lambda row: (row.created_at, row.id), reverse=True)
+        rows = rows[-(per_page + 1):] if after else rows[: per_page + 1]
+
+    has_more = len(rows) > per_page
+    if after:
+        submissions = rows[-per_page:]
+        has_newer, has_older = has_more, True
+    else:
+        submissions = rows[:per_page]
+        has_newer, has_older = before is not None, has_more
+
+    newer_cursor = older_cursor = None
+    if submissions:
+        if has_newer:
+            newer_cursor = _encode_cursor(submissions[0].created_at, submissions[0].id)
+        if has_older:
+            older_cursor = _encode_cursor(submissions[-1].created_at, submissions[-1].id)
+
+    # Query-string state carried by the pager and export links.
+    filters = {
+        "q": q or None,
+        "withdraw_from": withdraw_from.isoformat() if withdraw_from else None,
+        "withdraw_to": withdraw_to.isoformat() if withdraw_to else None,
+        "archive": "1" if include_archive else None,
+    }
+    return render_template(
+        "admin_dashboard.html",
+        submissions=submissions,
+        q=q,
+        withdraw_from=filters["withdraw_from"] or "",
+        withdraw_to=filters["withdraw_to"] or "",
+        filters=filters,
+        per_page=per_page,
+        newer_cursor=newer_cursor,
+        older_cursor=older_cursor,
+        export_jobs=get_export_jobs() is not None,
+        s_levels=S_LEVELS,
+        archive_enabled=archive_enabled(),
+        include_archive=include_archive,
+    )
 
 
 @admin_bp.route("/submission/<int:submission_id>")
 @login_required
 def submission_detail(submission_id: int):
-    submission = db.session.get(Submission, submission_id)
+    archived = _include_archive()
+    submission = db.session.get(Submission, submission_id, execution_options=tier_options(archived))
     if not submission:
         flash("Submission not found.", "warning")
         return redirect(url_for("admin.dashboard"))
 
-    return render_template("admin_detail.html", submission=submission)
+    return render_template("admin_detail.html", submission=submission, archived=archived)
 
 
 @admin_bp.route("/submission/<int:submission_id>/delete", methods=["POST"])
 @login_required
 def submission_delete(submission_id: int):
-    submission = db.session.get(Submission, submission_id)
-    if not submission:
+    if not delete_submissions(Submission.id == submission_id):
         flash("Submission not found.", "warning")
         return redirect(url_for("admin.dashboard"))
 
-    db.session.delete(submission)
-    db.session.commit()
     flash("Submission deleted.", "success")
     return redirect(url_for("admin.dashboard"))
 
 
-def _csv_response(filename: str, rows: list[dict], fieldnames: list[str]) -> Response:
-    sio = StringIO()
-    writer = csv.DictWriter(sio, fieldnames=fieldnames, extrasaction="ignore")
-    writer.writeheader()
-    for row in rows:
-        writer.writerow(row)
+@admin_bp.route("/submissions/delete", methods=["POST"])
+@login_required
+def submissions_delete():
+    """Delete the selected submissions or everything matching a filter.
+
+    Without ``confirm`` this is a dry run that shows what would be removed.
+    """
+    criteria = {
+        "ids": request.form.getlist("ids", type=int),
+        "q": (request.form.get("q") or "").strip(),
+        "created_from": _date_arg("created_from"),
+        "created_to": _date_arg("created_to"),
+        "s_level": (request.form.get("s_level") or "").strip(),
+    }
+    where = submission_filter(**criteria)
+    if where is None:
+        flash("Select submissions or give at least one filter to delete by.", "warning")
+        return redirect(url_for("admin.dashboard"))
+
+    if not request.form.get("confirm"):
+        return render_template("admin_delete_confirm.html", criteria=criteria, counts=count_submissions(where))
+
+    deleted = delete_submissions(where)
+    flash(f"Deleted {deleted:,} submission(s).", "success")
+    return redirect(url_for("admin.dashboard"))
+
+
+@admin_bp.route("/stats")
+@login_required
+@read_snapshot
+def stats():
+    levels, overall = level_stats()
+    return render_template("admin_stats.html", levels=levels, overall=overall)
 
-    output = sio.getvalue()
-    return Response(
-        output,
+
+@admin_bp.route("/stats.json")
+@login_required
+@read_snapshot
+def stats_json():
+    levels, overall = level_stats()
+
+    def serialize(row: dict) -> dict:
+        return {key: str(value) if isinstance(value, Decimal) else value for key, value in row.items()}
+
+    return jsonify(levels=[serialize(level) for level in levels], overall=serialize(overall))
+
+
+@admin_bp.route("/bots")
+@login_required
+@read_snapshot
+def bots():
+    return render_template("admin_bots.html", bots=bot_report())
+
+
+@admin_bp.route("/bots.json")
+@login_required
+@read_snapshot
+def bots_json():
+    return jsonify(bots=[{**bot, "subsidy_total": str(bot["subsidy_total"])} for bot in bot_report()])
+
+
+@admin_bp.route("/metrics")
+@login_required
+def metrics():
+    registry = get_registry(current_app)
+    if registry is None:
+        abort(404)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+@admin_bp.route("/api/submissions/bulk", methods=["POST"])
+@csrf.exempt
+@login_required
+def bulk_submissions():
+    """Backfill submissions from a streamed NDJSON body (one submission per line).
+
+    CSRF tokens are not required here; instead the NDJSON content type is, which
+    a cross-site form post cannot send without a CORS preflight.
+    """
+    if request.mimetype not in NDJSON_MIMETYPES:
+        return jsonify(error="Content-Type must be application/x-ndjson."), 415
+
+    started = time.perf_counter()
+    # request.stream is unbuffered; reading it line by line directly costs a
+    # call per byte.
+    body = io.BufferedReader(request.stream, buffer_size=1024 * 1024)
+    results = sorted(ingest_lines(body), key=lambda result: result["line"])
+    elapsed = time.perf_counter() - started
+
+    accepted = sum(1 for result in results if result["status"] == "accepted")
+    return jsonify(
+        summary={
+            "lines": len(results),
+            "accepted": accepted,
+            "rejected": len(results) - accepted,
+            "elapsed_seconds": round(elapsed, 3),
+            "records_per_second": round(len(results) / elapsed, 1) if elapsed else None,
+        },
+        results=results,
+    )
+
+
+def _csv_export(kind: str) -> Response:
+    """Serve an export from the on-disk cache, or stream it and fill the cache.
+
+    The ETag is the data version, so an unchanged export costs one
+    single-row read and a 304 (or a file send) instead of a rebuild.
+    """
+    filename, iter_rows, fieldnames = CSV_EXPORTS[kind]
+    withdraw_from, withdraw_to = _date_arg("withdraw_from"), _date_arg("withdraw_to")
+    include_archive = _include_archive()
+    variant = export_variant(withdraw_from, withdraw_to, include_archive)
+
+    version, changed_at = data_version()
+    etag = f"{kind}-{variant}-{version}"
+    # Weak comparison, as If-None-Match specifies: compressed responses carry W/"...".
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.last_modified = changed_at
+        return response
+
+    cache = get_export_cache()
+    cached = cache.lookup(kind, variant, version) if cache else None
+    if cached:
+        return send_file(
+            cached,
+            mimetype="text/csv",
+            as_attachment=True,
+            download_name=filename,
+            etag=etag,
+            last_modified=changed_at,
+        )
+
+    rows = iter_tiers(iter_rows, include_archive, where=withdraw_date_clause(Submission.id, withdraw_from, withdraw_to))
+    body = iter_csv(rows, fieldnames)
+    if cache:
+        body = cache.store(kind, variant, version, body)
+    response = Response(
+        stream_with_context(body),
         mimetype="text/csv",
         headers={"Content-Disposition": f"attachment; filename=\"{filename}\""},
     )
+    response.set_etag(etag)
+    response.last_modified = changed_at
+    return response
 
 
 @admin_bp.route("/export/submissions.csv")
 @login_required
+@read_snapshot
 def export_submissions_csv():
-    submissions = Submission.query.order_by(Submission.created_at.asc()).all()
-
-    rows = []
-    for s in submissions:
-        rows.append(
-            {
-                "submission_id": s.id,
-                "created_at": s.created_at.isoformat() if s.created_at else "",
-                "uid": s.uid,
-                "s_level": s.s_level,
-                "missed_salary_amount": str(s.missed_salary_amount) if s.missed_salary_amount is not None else "",
-                "owed_yy_bots": "yes" if s.owed_yy_bots else "no",
-                "yy_bot_count": len(s.yy_bots),
-                "yy_bot_names": ", ".join(bot.bot_name for bot in s.yy_bots),
-                "owed_fortibots_tickets": "yes" if s.owed_fortibots_tickets else "no",
-                "fortibots_ticket_amount": str(s.fortibots_ticket_amount) if s.fortibots_ticket_amount is not None else "",
-                "pending_withdraws": "yes" if s.pending_withdraws else "no",
-                "withdraw_dates": ", ".join(s.withdraw_dates_list()),
-                "bot_count": len(s.subsidy_bots),
-            }
-        )
-
-    fieldnames = [
-        "submission_id",
-        "created_at",
-        "uid",
-        "s_level",
-        "missed_salary_amount",
-        "owed_yy_bots",
-        "yy_bot_count",
-        "yy_bot_names",
-        "owed_fortibots_tickets",
-        "fortibots_ticket_amount",
-        "pending_withdraws",
-        "withdraw_dates",
-        "bot_count",
-    ]
-    return _csv_response("submissions.csv", rows, fieldnames)
+    return _csv_export("submissions")
 
 
 @admin_bp.route("/export/bots.csv")
 @login_required
+@read_snapshot
 def export_bots_csv():
-    bots = SubsidyBot.query.order_by(SubsidyBot.submission_id.asc(), SubsidyBot.id.asc()).all()
-    rows = []
-    for b in bots:
-        rows.append(
-            {
-                "submission_id": b.submission_id,
-                "bot_name": b.bot_name,
-                "subsidy_amount": str(b.subsidy_amount),
-            }
-        )
-
-    fieldnames = ["submission_id", "bot_name", "subsidy_amount"]
-    return _csv_response("subsidy_bots.csv", rows, fieldnames)
+    return _csv_export("bots")
 
 
 @admin_bp.route("/export/flat.csv")
 @login_required
+@read_snapshot
 def export_flat_csv():
     """One row per submission with flattened lists for exports."""
-    submissions = Submission.query.order_by(Submission.created_at.asc()).all()
-    rows = []
-    for s in submissions:
-        bot_names = ", ".join(bot.bot_name for bot in s.subsidy_bots)
-        subsidy_amounts = ", ".join(str(bot.subsidy_amount) for bot in s.subsidy_bots)
-        rows.append(
-            {
-                "submission_id": s.id,
-                "created_at": s.created_at.isoformat() if s.created_at else "",
-                "uid": s.uid,
-                "s_level": s.s_level,
-                "missed_salary_amount": str(s.missed_salary_amount) if s.missed_salary_amount is not None else "",
-                "owed_yy_bots": "yes" if s.owed_yy_bots else "no",
-                "owed_fortibots_tickets": "yes" if s.owed_fortibots_tickets else "no",
-                "fortibots_ticket_amount": str(s.fortibots_ticket_amount) if s.fortibots_ticket_amount is not None else "",
-                "pending_withdraws": "yes" if s.pending_withdraws else "no",
-                "withdraw_dates": ", ".join(s.withdraw_dates_list()),
-                "yy_bot_names": ", ".join(bot.bot_name for bot in s.yy_bots),
-                "yy_bot_name": "",
-                "bot_name": bot_names,
-                "subsidy_amount": subsidy_amounts,
-            }
-        )
+    return _csv_export("flat")
+
+
+def _cursor_arg(name: str, default: int | None) -> int | None:
+    value = (request.args.get(name) or "").strip()
+    if not value:
+        return default
+    if not value.isdigit():
+        abort(400, description=f"{name} must be a non-negative integer.")
+    return int(value)
+
+
+@admin_bp.route("/export/changes.ndjson")
+@login_required
+@read_snapshot
+def export_changes_ndjson():
+    """Submissions inserted, updated or deleted after the ``since`` cursor, as NDJSON.
+
+    The last line (and the X-Next-Cursor header) is the cursor to pass next time.
+    """
+    since = _cursor_arg("since", 0)
+    until = change_window(since, _cursor_arg("limit", None) or None)
+
+    def generate():
+        for change in iter_changes(since, until):
+            yield json.dumps(change, separators=(",", ":")) + "\n"
+        yield json.dumps({"next_cursor": until}) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"X-Next-Cursor": str(until), "Cache-Control": "no-store"},
+    )
+
+
+def _export_job_runner():
+    runner = get_export_jobs()
+    if runner is None:
+        abort(404, description="Background exports are disabled.")
+    return runner
+
+
+@admin_bp.route("/export/jobs", methods=["POST"])
+@login_required
+def export_job_create():
+    """Queue a CSV export to be written in the background; poll the returned status_url."""
+    runner = _export_job_runner()
+    kind = request.form.get("kind", "")
+    if kind not in CSV_EXPORTS:
+        abort(400, description="Unknown export kind.")
+    job = runner.submit(kind, _date_arg("withdraw_from"), _date_arg("withdraw_to"), _include_archive())
+    return jsonify(job_status(job, runner)), 202
 
-    fieldnames = [
-        "submission_id",
-        "created_at",
-        "uid",
-        "s_level",
-        "missed_salary_amount",
-        "owed_yy_bots",
-        "owed_fortibots_tickets",
-        "fortibots_ticket_amount",
-        "pending_withdraws",
-        "withdraw_dates",
-        "yy_bot_names",
-        "yy_bot_name",
-        "bot_name",
-        "subsidy_amount",
-    ]
-    return _csv_response("submissions_flat.csv", rows, fieldnames)
+
+@admin_bp.route("/export/jobs/<int:job_id>")
+@login_required
+def export_job_status(job_id: int):
+    runner = _export_job_runner()
+    job = db.session.get(ExportJob, job_id) or abort(404)
+    return jsonify(job_status(job, runner))
+
+
+@admin_bp.route("/export/jobs/<int:job_id>/download")
+@login_required
+def export_job_download(job_id: int):
+    _export_job_runner()
+    job = db.session.get(ExportJob, job_id)
+    if job is None or job.status != "done" or not job.path or not os.path.exists(job.path):
+        abort(404)
+    filename = CSV_EXPORTS[job.kind][0]
+    return send_file(job.path, mimetype="text/csv", as_attachment=True, download_name=filename)
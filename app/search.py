@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import re
+from datetime import date
+
+from sqlalchemy import and_, intersect, select
+from sqlalchemy.sql.elements import ColumnElement
+
+from .models import Submission, WithdrawDate, submission_uid_trigrams
+
+
+UID_PATTERN = re.compile(r"^\d{7}$")
+
+
+def uid_trigrams(value: str) -> list[str]:
+    value = value.lower()
+    return sorted({value[i : i + 3] for i in range(len(value) - 2)})
+
+
+def _prefix_clause(prefix: str) -> ColumnElement[bool]:
+    # A half-open range lets SQLite walk the uid index instead of scanning.
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(Submission.uid >= prefix, Submission.uid < upper)
+
+
+def uid_search_clause(q: str) -> ColumnElement[bool]:
+    """Filter for the dashboard UID search box.
+
+    A full 7-digit UID is an exact lookup and ``123*`` is a prefix search; both
+    use the unique uid index. Anything else is a substring search that is
+    narrowed through the trigram table before the (case-insensitive) match is
+    re-checked on the few candidate rows.
+    """
+    if UID_PATTERN.match(q):
+        return Submission.uid == q
+
+    if q.endswith("*") and len(q) > 1 and "*" not in q[:-1]:
+        return _prefix_clause(q[:-1])
+
+    contains = Submission.uid.icontains(q, autoescape=True)
+    grams = uid_trigrams(q)
+    if not grams:
+        return contains
+
+    t = submission_uid_trigrams.c
+    candidates = [select(t.submission_id).where(t.trigram == gram) for gram in grams]
+    candidate_ids = candidates[0] if len(candidates) == 1 else intersect(*candidates)
+    return and_(Submission.id.in_(candidate_ids), contains)
+
+
+def withdraw_date_clause(submission_id, start: date | None, end: date | None) -> ColumnElement[bool] | None:
+    """Rows whose submission has a withdraw date in ``[start, end]`` (either bound optional).
+
+    The range is resolved on the (withdraw_date, submission_id) index alone.
+    """
+    if start is None and end is None:
+        return None
+
+    matching = select(WithdrawDate.submission_id)
+    if start is not None:
+        matching = matching.where(WithdrawDate.withdraw_date >= start)
+    if end is not None:
+        matching = matching.where(WithdrawDate.withdraw_date <= end)
+    return submission_id.in_(matching)
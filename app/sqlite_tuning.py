@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+
+def load_sqlite_config(config: dict) -> None:
+    """Read the opt-in SQLite performance profile from the environment."""
+    config["SQLITE_TUNING"] = os.environ.get("SQLITE_TUNING", "0").lower() in ("1", "true", "yes", "on")
+    config["SQLITE_JOURNAL_MODE"] = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    config["SQLITE_SYNCHRONOUS"] = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    config["SQLITE_CACHE_SIZE_KB"] = int(os.environ.get("SQLITE_CACHE_SIZE_KB", "65536"))
+    config["SQLITE_MMAP_SIZE"] = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    config["SQLITE_POOL_SIZE"] = int(os.environ.get("SQLITE_POOL_SIZE", "5"))
+    config["SQLITE_POOL_TIMEOUT"] = int(os.environ.get("SQLITE_POOL_TIMEOUT", "30"))
+
+
+def is_sqlite_file(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def engine_options(config: dict) -> dict:
+    """Pool settings for a file-backed SQLite engine under the tuning profile."""
+    if not config["SQLITE_TUNING"] or not is_sqlite_file(config["SQLALCHEMY_DATABASE_URI"]):
+        return {}
+
+    return {
+        "pool_size": config["SQLITE_POOL_SIZE"],
+        "max_overflow": config["SQLITE_POOL_SIZE"],
+        "pool_timeout": config["SQLITE_POOL_TIMEOUT"],
+        # pysqlite's own busy handler; mirrors PRAGMA busy_timeout below.
+        "connect_args": {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000},
+    }
+
+
+def connection_pragmas(config: dict) -> list[str]:
+    # Always on, tuning or not: deletes rely on ON DELETE CASCADE for child rows.
+    pragmas = ["PRAGMA foreign_keys=ON"]
+    if not config["SQLITE_TUNING"]:
+        return pragmas
+
+    return pragmas + [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT_MS']:d}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        # Negative cache_size is interpreted by SQLite as KiB rather than pages.
+        f"PRAGMA cache_size={-config['SQLITE_CACHE_SIZE_KB']:d}",
+        f"PRAGMA mmap_size={config['SQLITE_MMAP_SIZE']:d}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def register_pragmas(engine: Engine, pragmas: list[str]) -> None:
+    """Run ``pragmas`` on every new DBAPI connection the engine opens."""
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
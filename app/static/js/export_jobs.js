@@ -0,0 +1,78 @@
+(function () {
+  const form = document.getElementById('exportJobForm');
+  if (!form) return;
+
+  const statusWrap = document.getElementById('exportJobStatus');
+  const bar = document.getElementById('exportJobBar');
+  const text = document.getElementById('exportJobText');
+  const download = document.getElementById('exportJobDownload');
+  const buttons = form.querySelectorAll('button[name="kind"]');
+  const POLL_MS = 1000;
+
+  function setBusy(busy) {
+    buttons.forEach((button) => { button.disabled = busy; });
+  }
+
+  function render(job) {
+    statusWrap.hidden = false;
+    const total = job.rows_total;
+    const pct = total ? Math.min(100, Math.round((job.rows_written / total) * 100)) : 0;
+    bar.style.width = (job.status === 'done' ? 100 : pct) + '%';
+    bar.classList.toggle('bg-danger', job.status === 'failed');
+
+    if (job.status === 'failed') {
+      text.textContent = 'Export failed: ' + (job.error || 'unknown error');
+    } else if (job.status === 'done') {
+      text.textContent = job.rows_written.toLocaleString() + ' rows ready';
+    } else if (job.status === 'running' && total !== null) {
+      text.textContent = job.rows_written.toLocaleString() + ' / ' + total.toLocaleString() + ' rows';
+    } else {
+      text.textContent = 'Queued…';
+    }
+
+    download.hidden = !job.download_url;
+    if (job.download_url) download.href = job.download_url;
+  }
+
+  function poll(url) {
+    fetch(url, { headers: { Accept: 'application/json' }, credentials: 'same-origin' })
+      .then((response) => {
+        if (!response.ok) throw new Error('HTTP ' + response.status);
+        return response.json();
+      })
+      .then((job) => {
+        render(job);
+        if (job.status === 'done' || job.status === 'failed') {
+          setBusy(false);
+          if (job.download_url) window.location.href = job.download_url;
+          return;
+        }
+        window.setTimeout(() => poll(url), POLL_MS);
+      })
+      .catch((error) => {
+        setBusy(false);
+        render({ status: 'failed', error: error.message, rows_written: 0, rows_total: null });
+      });
+  }
+
+  form.addEventListener('submit', (event) => {
+    event.preventDefault();
+    const data = new FormData(form);
+    if (event.submitter) data.set('kind', event.submitter.value);
+    setBusy(true);
+    download.hidden = true;
+    fetch(form.action, { method: 'POST', body: data, credentials: 'same-origin' })
+      .then((response) => {
+        if (!response.ok) throw new Error('HTTP ' + response.status);
+        return response.json();
+      })
+      .then((job) => {
+        render(job);
+        poll(job.status_url);
+      })
+      .catch((error) => {
+        setBusy(false);
+        render({ status: 'failed', error: error.message, rows_written: 0, rows_total: null });
+      });
+  });
+})();
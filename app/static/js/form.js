@@ -241,6 +241,45 @@
     pendingWithdrawsToggle.addEventListener('change', updateWithdrawVisibility);
   }
 
+  // Live UID availability: ask once typing pauses; the server still re-checks on submit.
+  const uidInput = document.getElementById('uid');
+  const uidStatus = document.getElementById('uidAvailability');
+  let uidTimer = null;
+  let uidRequest = 0;
+
+  function showUidStatus(text, className) {
+    uidStatus.textContent = text;
+    uidStatus.className = 'form-text ' + className;
+  }
+
+  function checkUidAvailability() {
+    const uid = uidInput.value.trim();
+    if (!/^\d{7}$/.test(uid)) {
+      showUidStatus('', '');
+      return;
+    }
+    const requestId = ++uidRequest;
+    fetch(uidStatus.dataset.url + '?uid=' + encodeURIComponent(uid), { headers: { Accept: 'application/json' } })
+      .then((response) => (response.ok ? response.json() : null))
+      .then((result) => {
+        // Ignore answers for a value the user has already changed.
+        if (!result || requestId !== uidRequest || result.uid !== uidInput.value.trim()) return;
+        if (result.available) {
+          showUidStatus('UID is available.', 'text-success');
+        } else {
+          showUidStatus('UID already exists. Please use a unique UID.', 'text-danger');
+        }
+      })
+      .catch(() => showUidStatus('', ''));
+  }
+
+  if (uidInput && uidStatus) {
+    uidInput.addEventListener('input', () => {
+      window.clearTimeout(uidTimer);
+      uidTimer = window.setTimeout(checkUidAvailability, 250);
+    });
+  }
+
   // initial state
   if (typeof window.__INITIAL_TICKETS_CHECKED__ !== 'undefined') {
     if (owedToggle) owedToggle.checked = !!window.__INITIAL_TICKETS_CHECKED__;
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+
+from flask import Flask, abort, send_file
+from werkzeug.security import safe_join
+
+from .compression import available_encodings, brotli, negotiate_encoding
+
+
+# Fingerprinted URLs never change content, so browsers may keep them for a year.
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+PRECOMPRESSED_EXTENSIONS = (".css", ".js", ".svg", ".json", ".txt", ".map")
+
+_FINGERPRINT = re.compile(r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{12})(?P<ext>\.[^./]+)$")
+
+_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class StaticAssets:
+    """Content-hashed URLs and precompressed copies of the files in ``static_folder``.
+
+    ``url_for('static', filename='css/theme.css')`` becomes
+    ``/static/css/theme.<digest>.css``; the digest is re-read when the file's
+    mtime or size changes, so an edited file gets a new URL without a
+    restart. Gzip (and Brotli, when installed) copies are written once per
+    digest to ``cache_dir`` and sent as-is to clients that accept them.
+    """
+
+    def __init__(self, static_folder: str, cache_dir: str) -> None:
+        self.static_folder = static_folder
+        self.cache_dir = cache_dir
+        self.encodings = available_encodings()
+        self._digests: dict[str, tuple[int, int, str]] = {}
+
+    def digest(self, filename: str) -> str | None:
+        path = safe_join(self.static_folder, filename)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        cached = self._digests.get(filename)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        with open(path, "rb") as handle:
+            digest = hashlib.sha256(handle.read()).hexdigest()[:12]
+        self._digests[filename] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def url_filename(self, filename: str) -> str:
+        digest = self.digest(filename)
+        if digest is None:
+            return filename
+        stem, ext = os.path.splitext(filename)
+        return f"{stem}.{digest}{ext}"
+
+    def resolve(self, requested: str) -> tuple[str, bool]:
+        """``(real filename, whether the requested digest is the current one)``."""
+        match = _FINGERPRINT.match(requested)
+        if match:
+            filename = match["stem"] + match["ext"]
+            digest = self.digest(filename)
+            if digest is not None:
+                return filename, digest == match["digest"]
+        return requested, False
+
+    def _precompressed(self, filename: str, encoding: str) -> str | None:
+        if not filename.endswith(PRECOMPRESSED_EXTENSIONS):
+            return None
+        digest = self.digest(filename)
+        if digest is None:
+            return None
+        target = os.path.join(self.cache_dir, f"{filename}.{digest}{_SUFFIXES[encoding]}")
+        if os.path.exists(target):
+            return target
+
+        with open(safe_join(self.static_folder, filename), "rb") as handle:
+            data = handle.read()
+        data = brotli.compress(data, quality=11) if encoding == "br" else gzip.compress(data, 9, mtime=0)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Several workers may build the same copy at once; each renames a complete file.
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(temp_path, target)
+        return target
+
+    def send(self, requested: str):
+        filename, fingerprinted = self.resolve(requested)
+        source = safe_join(self.static_folder, filename)
+        if source is None or not os.path.isfile(source):
+            abort(404)
+
+        # Unknown or stale digests still get the current file, but revalidated as usual.
+        max_age = IMMUTABLE_MAX_AGE if fingerprinted else None
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        encoding = negotiate_encoding(self.encodings) if filename.endswith(PRECOMPRESSED_EXTENSIONS) else None
+        path = self._precompressed(filename, encoding) if encoding else None
+
+        response = send_file(path or source, mimetype=mimetype, max_age=max_age, conditional=True)
+        if path:
+            response.headers["Content-Encoding"] = encoding
+        if filename.endswith(PRECOMPRESSED_EXTENSIONS):
+            response.vary.add("Accept-Encoding")
+        if fingerprinted:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        return response
+
+
+def init_static_assets(app: Flask) -> None:
+    if not app.config["STATIC_FINGERPRINTS"] or not app.static_folder:
+        return
+
+    assets = StaticAssets(app.static_folder, app.config["STATIC_CACHE_DIR"])
+    app.extensions["static_assets"] = assets
+
+    @app.url_defaults
+    def _fingerprint_static(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = assets.url_filename(values["filename"])
+
+    def static(filename: str):
+        return assets.send(filename)
+
+    # Replaces Flask's own static view; same endpoint and URL rule.
+    app.view_functions["static"] = static
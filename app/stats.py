@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from sqlalchemy import case, delete, func, insert, or_, select
+from sqlalchemy.engine import Connection
+
+from . import db
+from .archive import ARCHIVE_OPTIONS, ARCHIVE_SCHEMA_VERSION, archive_schema_version
+from .models import Bot, Submission, SubmissionStats, SubsidyBot, YyBot
+
+
+STAT_FIELDS = [
+    "submission_count",
+    "missed_salary_total",
+    "fortibots_ticket_total",
+    "subsidy_total",
+    "subsidy_bot_count",
+    "yy_bot_count",
+    "pending_withdraw_count",
+]
+
+
+def rebuild_submission_stats(connection: Connection | None = None) -> int:
+    """Recompute submission_stats from the data tables (full scan; no commit).
+
+    Counts the archive tier too when one is attached: archiving moves rows
+    without taking them out of the stats. Runs on ``connection`` when given
+    (migrations), else on the session.
+    """
+    executor = connection or db.session
+    tiers = [{}]
+    if archive_schema_version(executor) == ARCHIVE_SCHEMA_VERSION:
+        tiers.append(ARCHIVE_OPTIONS)
+    totals: dict[str, dict] = {}
+
+    def level(s_level: str) -> dict:
+        return totals.setdefault(s_level, {"s_level": s_level, **{name: 0 for name in STAT_FIELDS}})
+
+    for options in tiers:
+        rows = executor.execute(
+            select(
+                Submission.s_level,
+                func.count(),
+                func.coalesce(func.sum(Submission.missed_salary_amount), 0),
+                func.coalesce(func.sum(Submission.fortibots_ticket_amount), 0),
+                func.coalesce(func.sum(case((Submission.pending_withdraws, 1), else_=0)), 0),
+            ).group_by(Submission.s_level),
+            execution_options=options,
+        )
+        for s_level, count, missed, tickets, pending in rows:
+            entry = level(s_level)
+            entry["submission_count"] += count
+            entry["missed_salary_total"] += missed
+            entry["fortibots_ticket_total"] += tickets
+            entry["pending_withdraw_count"] += pending
+
+        rows = executor.execute(
+            select(Submission.s_level, func.count(), func.coalesce(func.sum(SubsidyBot.subsidy_amount), 0))
+            .join(SubsidyBot, SubsidyBot.submission_id == Submission.id)
+            .group_by(Submission.s_level),
+            execution_options=options,
+        )
+        for s_level, count, total in rows:
+            level(s_level)["subsidy_bot_count"] += count
+            level(s_level)["subsidy_total"] += total
+
+        rows = executor.execute(
+            select(Submission.s_level, func.count())
+            .join(YyBot, YyBot.submission_id == Submission.id)
+            .group_by(Submission.s_level),
+            execution_options=options,
+        )
+        for s_level, count in rows:
+            level(s_level)["yy_bot_count"] += count
+
+    executor.execute(delete(SubmissionStats))
+    if totals:
+        executor.execute(insert(SubmissionStats.__table__), list(totals.values()))
+    return len(totals)
+
+
+def level_stats() -> tuple[list[dict], dict]:
+    """Per-level rows (reads O(levels) rows) plus a grand-total row."""
+    rows = db.session.execute(select(SubmissionStats).order_by(SubmissionStats.s_level)).scalars().all()
+
+    levels = [{"s_level": row.s_level, **{name: getattr(row, name) for name in STAT_FIELDS}} for row in rows]
+    overall = {name: sum((level[name] for level in levels), 0) for name in STAT_FIELDS}
+    return levels, overall
+
+
+def bot_report() -> list[dict]:
+    """Per-bot subsidy count/total and YY count, grouped on the integer bot id."""
+    subsidy = (
+        select(
+            SubsidyBot.bot_id,
+            func.count().label("subsidy_count"),
+            func.sum(SubsidyBot.subsidy_amount).label("subsidy_total"),
+        )
+        .group_by(SubsidyBot.bot_id)
+        .subquery()
+    )
+    yy = select(YyBot.bot_id, func.count().label("yy_count")).group_by(YyBot.bot_id).subquery()
+
+    subsidy_total = func.coalesce(subsidy.c.subsidy_total, 0)
+    rows = db.session.execute(
+        select(
+            Bot.name,
+            func.coalesce(subsidy.c.subsidy_count, 0).label("subsidy_count"),
+            subsidy_total.label("subsidy_total"),
+            func.coalesce(yy.c.yy_count, 0).label("yy_count"),
+        )
+        .outerjoin(subsidy, subsidy.c.bot_id == Bot.id)
+        .outerjoin(yy, yy.c.bot_id == Bot.id)
+        .where(or_(subsidy.c.bot_id.is_not(None), yy.c.bot_id.is_not(None)))
+        .order_by(subsidy_total.desc(), Bot.name)
+    )
+    return [row._asdict() for row in rows]
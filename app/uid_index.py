@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from flask import Flask, current_app
+from sqlalchemy import select
+
+from . import db
+from .export_cache import data_version
+from .models import Submission, archived_uids
+from .search import UID_PATTERN
+
+
+UID_SPACE = 10**7
+
+
+class UidIndex:
+    """Bitmap over the 10**7 possible 7-digit UIDs for the live availability check.
+
+    A clear bit means the UID was free at the last refresh, which answers the
+    common case without SQLite. A set bit is confirmed against the database
+    before saying "taken", and cleared if the row has since been deleted, so
+    only inserts need propagating: rows above the highest id seen are read,
+    at most every ``refresh_interval`` seconds and only once the data version
+    has moved. Each worker builds its bitmap (1.25 MB) on a background thread
+    at the first lookup and answers from the uid index until it is ready.
+    """
+
+    def __init__(self, refresh_interval: float = 5.0) -> None:
+        self.refresh_interval = refresh_interval
+        self._bits: bytearray | None = None
+        self._max_id = 0
+        self._version: int | None = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._loader: threading.Thread | None = None
+
+    @staticmethod
+    def _flip(bits: bytearray, uid: str, taken: bool) -> None:
+        number = int(uid)
+        mask = 1 << (number & 7)
+        if taken:
+            bits[number >> 3] |= mask
+        else:
+            bits[number >> 3] &= ~mask
+
+    def _mark(self, uid: str, taken: bool) -> None:
+        if self._bits is not None and UID_PATTERN.match(uid):
+            with self._lock:
+                self._flip(self._bits, uid, taken)
+
+    @staticmethod
+    def _taken(uid: str) -> bool:
+        if db.session.scalar(select(Submission.id).where(Submission.uid == uid)) is not None:
+            return True
+        return db.session.scalar(select(archived_uids.c.uid).where(archived_uids.c.uid == uid)) is not None
+
+    def _read_into(self, bits: bytearray, after_id: int) -> int:
+        """Set the bits of rows above ``after_id``; returns the highest id read."""
+        rows = db.session.execute(select(Submission.id, Submission.uid).where(Submission.id > after_id)).tuples()
+        max_id = after_id
+        for submission_id, uid in rows:
+            if UID_PATTERN.match(uid):
+                self._flip(bits, uid, True)
+            max_id = max(max_id, submission_id)
+        return max_id
+
+    def _load(self, app: Flask) -> None:
+        with app.app_context():
+            try:
+                bits = bytearray(UID_SPACE // 8)
+                # Read the version first: anything committed after it is re-read on refresh.
+                version, _ = data_version()
+                max_id = self._read_into(bits, 0)
+                # Archived UIDs stay taken; they only ever grow by moving live rows.
+                for uid in db.session.scalars(select(archived_uids.c.uid)):
+                    if UID_PATTERN.match(uid):
+                        self._flip(bits, uid, True)
+                with self._lock:
+                    self._bits, self._max_id, self._version = bits, max_id, version
+                    self._checked = time.monotonic()
+            except Exception:
+                app.logger.exception("Loading the UID availability index failed")
+                with self._lock:
+                    self._loader = None
+            finally:
+                db.session.remove()
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._checked < self.refresh_interval:
+            return
+        self._checked = now
+        version, _ = data_version()
+        if version == self._version:
+            return
+        with self._lock:
+            self._max_id = self._read_into(self._bits, self._max_id)
+            self._version = version
+
+    def add(self, uid: str) -> None:
+        """Record a UID this worker has just seen committed (or rejected as taken)."""
+        self._mark(uid, True)
+
+    def is_available(self, uid: str) -> bool:
+        """True unless a submission with ``uid`` exists; ``uid`` must be 7 digits."""
+        if self._bits is None:
+            with self._lock:
+                if self._loader is None:
+                    self._loader = threading.Thread(
+                        target=self._load, args=(current_app._get_current_object(),), name="uid-index", daemon=True
+                    )
+                    self._loader.start()
+        else:
+            self._refresh()
+            number = int(uid)
+            if not self._bits[number >> 3] & (1 << (number & 7)):
+                return True
+
+        if not self._taken(uid):
+            self._mark(uid, False)
+            return True
+        return False
+
+
+def init_uid_index(app: Flask) -> None:
+    app.extensions["uid_index"] = UidIndex(refresh_interval=app.config["UID_INDEX_REFRESH_SECONDS"])
+
+
+def get_uid_index() -> UidIndex:
+    return current_app.extensions["uid_index"]
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Flask, current_app
+from flask_login import UserMixin
+
+
+def password_fingerprint(password_hash: str) -> str:
+    """Short digest of the stored hash; changes whenever the password does."""
+    return hashlib.sha256(password_hash.encode()).hexdigest()[:16]
+
+
+class UserSnapshot(UserMixin):
+    """What an authenticated request needs of a user, detached from any session."""
+
+    def __init__(self, id: int, username: str, fingerprint: str) -> None:
+        self.id = id
+        self.username = username
+        self.fingerprint = fingerprint
+
+    def get_id(self) -> str:
+        return f"{self.id}:{self.fingerprint}"
+
+
+class UserCache:
+    """Process-local TTL/LRU of user id -> UserSnapshot for the login loader.
+
+    Password changes and new users are made by CLI commands in another
+    process, which touch ``stamp_path``. Every lookup stats that file and
+    drops all entries once its mtime moves, so a changed password ends old
+    sessions on the next request in every worker; ``ttl`` bounds how long an
+    entry can outlive a change made any other way.
+    """
+
+    def __init__(self, stamp_path: str, ttl: float = 60.0, size: int = 1024) -> None:
+        self.stamp_path = stamp_path
+        self.ttl = ttl
+        self.size = size
+        self._entries: OrderedDict[int, tuple[UserSnapshot, float]] = OrderedDict()
+        self._stamp: int | None = None
+        self._lock = threading.Lock()
+
+    def _read_stamp(self) -> int:
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def get(self, user_id: int) -> UserSnapshot | None:
+        stamp = self._read_stamp()
+        with self._lock:
+            if stamp != self._stamp:
+                self._entries.clear()
+                self._stamp = stamp
+                return None
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+    def put(self, snapshot: UserSnapshot) -> None:
+        with self._lock:
+            self._entries[snapshot.id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+def invalidate_user_cache() -> None:
+    """Make every worker reload users on their next request (call after committing)."""
+    path = current_app.config["AUTH_STAMP_PATH"]
+    with open(path, "a", encoding="utf-8"):
+        pass
+    os.utime(path)
+
+
+def init_user_cache(app: Flask) -> None:
+    if app.config["USER_CACHE_TTL"] <= 0:
+        return
+
+    app.extensions["user_cache"] = UserCache(app.config["AUTH_STAMP_PATH"], ttl=app.config["USER_CACHE_TTL"])
+
+
+def get_user_cache() -> UserCache | None:
+    return current_app.extensions.get("user_cache")
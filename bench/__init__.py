@@ -0,0 +1,8 @@
+"""Benchmarks for the data collector.
+
+Seed a throwaway SQLite database with synthetic submissions, then measure the
+hot endpoints and write machine-readable JSON so runs can be compared::
+
+    python -m bench seed --db /tmp/bench.db --size 100k
+    python -m bench run --db /tmp/bench.db --output results.json
+"""
@@ -0,0 +1,63 @@
+"""Command line for the benchmarks: ``python -m bench seed`` and ``python -m bench run``."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from .datagen import SIZES, parse_size
+from .runner import EXPORT_KINDS, probe_export, run, seed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_cmd = commands.add_parser("seed", help="fill a database with synthetic submissions")
+    seed_cmd.add_argument("--db", required=True, help="SQLite file to create or extend")
+    seed_cmd.add_argument("--size", default="10k", help=f"row count or one of {', '.join(SIZES)}")
+    seed_cmd.add_argument("--seed", type=int, default=1, help="random seed (change it to extend a database)")
+
+    run_cmd = commands.add_parser("run", help="measure endpoints against a seeded database")
+    run_cmd.add_argument("--db", required=True)
+    run_cmd.add_argument("--output", help="write JSON results here (default: stdout)")
+    run_cmd.add_argument("--posts", type=int, default=200, help="POST / requests to time")
+    run_cmd.add_argument("--repeat", type=int, default=20, help="samples per read endpoint")
+    run_cmd.add_argument("--exports", nargs="*", choices=EXPORT_KINDS, default=None)
+    run_cmd.add_argument("--gunicorn", action="store_true", help="also measure through a gunicorn server")
+    run_cmd.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    run_cmd.add_argument("--concurrency", type=int, default=8, help="concurrent HTTP clients for gunicorn POSTs")
+
+    probe_cmd = commands.add_parser("probe-export", help=argparse.SUPPRESS)
+    probe_cmd.add_argument("--db", required=True)
+    probe_cmd.add_argument("--kind", choices=EXPORT_KINDS, required=True)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "seed":
+        result = seed(args.db, parse_size(args.size), seed_value=args.seed)
+    elif args.command == "probe-export":
+        result = probe_export(args.db, args.kind)
+    else:
+        result = run(
+            args.db,
+            posts=args.posts,
+            repeat=args.repeat,
+            exports=args.exports,
+            gunicorn=args.gunicorn,
+            concurrency=args.concurrency,
+            workers=args.workers,
+        )
+
+    text = json.dumps(result, indent=2)
+    if getattr(args, "output", None):
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
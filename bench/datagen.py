@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import random
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+
+from app.forms import MAX_SUBSIDY_BOTS, MAX_YY_BOTS, S_LEVELS
+
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Seeded data draws UIDs below this; benchmark POSTs use the UIDs above it so
+# they never collide with existing rows.
+RESERVED_UID_START = 9_900_000
+
+# Names people actually type, including the case/whitespace variants the
+# public form receives for the same bot.
+BOT_NAMES = [
+    "Alpha", "Bravo", "Charlie", "Delta", "Echo", "Foxtrot", "Golf", "Hotel",
+    "India", "Juliet", "Kilo", "Lima", "Mike", "November", "Oscar", "Papa",
+    "Quebec", "Romeo", "Sierra", "Tango", "Uniform", "Victor", "Whiskey",
+    "X-ray", "Yankee", "Zulu", "Fortibot Mini", "Fortibot Pro", "YY Classic",
+    "YY Turbo", "Arbitrage 1", "Arbitrage 2", "Grid Runner", "Moon Shot",
+]
+
+
+def parse_size(value: str) -> int:
+    return SIZES.get(value.lower()) or int(value)
+
+
+def _variant(rnd: random.Random, name: str) -> str:
+    roll = rnd.random()
+    if roll < 0.1:
+        return name.lower()
+    if roll < 0.15:
+        return f" {name.upper()} "
+    return name
+
+
+def subsidy_bot_count(rnd: random.Random) -> int:
+    """Skewed towards a handful of bots, with a long tail up to the form maximum."""
+    roll = rnd.random()
+    if roll < 0.30:
+        return 0
+    if roll < 0.97:
+        return min(MAX_SUBSIDY_BOTS, int(rnd.expovariate(1 / 4)) + 1)
+    return rnd.randint(20, MAX_SUBSIDY_BOTS)
+
+
+def _amount(rnd: random.Random, upper: float) -> str:
+    return f"{rnd.uniform(0, upper):.2f}"
+
+
+def generate_records(count: int, seed: int = 1, uids: list[int] | None = None) -> Iterator[dict]:
+    """Yield ``count`` bulk-ingest records with unique 7-digit UIDs."""
+    rnd = random.Random(seed)
+    if uids is None:
+        uids = rnd.sample(range(RESERVED_UID_START), count)
+    start = datetime(2024, 1, 1)
+
+    for position, uid in enumerate(uids):
+        owed_yy_bots = rnd.random() < 0.35
+        owed_tickets = rnd.random() < 0.25
+        pending = rnd.random() < 0.2
+        created_at = start + timedelta(seconds=position * 30 + rnd.randint(0, 29))
+        yield {
+            "uid": f"{uid:07d}",
+            "s_level": rnd.choice(S_LEVELS),
+            "missed_salary_amount": _amount(rnd, 2000) if rnd.random() < 0.6 else None,
+            "owed_yy_bots": owed_yy_bots,
+            "yy_bots": [
+                _variant(rnd, rnd.choice(BOT_NAMES)) for _ in range(rnd.randint(1, MAX_YY_BOTS // 3))
+            ]
+            if owed_yy_bots
+            else [],
+            "owed_fortibots_tickets": owed_tickets,
+            "fortibots_ticket_amount": _amount(rnd, 500) if owed_tickets else None,
+            "pending_withdraws": pending,
+            "withdraw_dates": [
+                (created_at - timedelta(days=rnd.randint(1, 90))).date().isoformat()
+                for _ in range(rnd.randint(1, 2))
+            ]
+            if pending
+            else [],
+            "subsidy_bots": [
+                {"bot_name": _variant(rnd, rnd.choice(BOT_NAMES)), "subsidy_amount": _amount(rnd, 300)}
+                for _ in range(subsidy_bot_count(rnd))
+            ],
+            "created_at": created_at.isoformat(),
+        }
+
+
+def form_payload(record: dict) -> dict:
+    """The same record encoded as the public form would post it."""
+    data = {"uid": record["uid"], "s_level": record["s_level"]}
+    if record["missed_salary_amount"]:
+        data["missed_salary_amount"] = record["missed_salary_amount"]
+    if record["owed_yy_bots"]:
+        data["owed_yy_bots"] = "y"
+        for position, name in enumerate(record["yy_bots"]):
+            data[f"yy_bots-{position}"] = name
+    if record["owed_fortibots_tickets"]:
+        data["owed_fortibots_tickets"] = "y"
+        data["fortibots_ticket_amount"] = record["fortibots_ticket_amount"]
+    if record["pending_withdraws"]:
+        data["pending_withdraws"] = "y"
+        for position, value in enumerate(record["withdraw_dates"]):
+            data[f"withdraw_dates-{position}"] = value
+    for position, bot in enumerate(record["subsidy_bots"]):
+        data[f"subsidy_bots-{position}-bot_name"] = bot["bot_name"]
+        data[f"subsidy_bots-{position}-subsidy_amount"] = bot["subsidy_amount"]
+    return data
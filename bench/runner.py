@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+import http.cookiejar
+import json
+import os
+import platform
+import re
+import resource
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+from .datagen import RESERVED_UID_START, form_payload, generate_records
+
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+EXPORT_KINDS = ["submissions", "bots", "flat"]
+
+_CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def make_app(db_path: str, csrf: bool = False):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+    # Every benchmark POST comes from one client; measure the app, not the limiter.
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    # Time the exports themselves, not a send_file of the previous probe's cached copy.
+    os.environ.setdefault("EXPORT_CACHE_DIR", "")
+    from app import create_app, db
+    from app.models import User
+
+    app = create_app()
+    app.config["WTF_CSRF_ENABLED"] = csrf
+    with app.app_context():
+        db.create_all()
+        if not User.query.filter_by(username=BENCH_USER).first():
+            user = User(username=BENCH_USER)
+            user.set_password(BENCH_PASSWORD)
+            db.session.add(user)
+            db.session.commit()
+    return app
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency summary in milliseconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _metadata(db_path: str) -> dict:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+
+    with sqlite3.connect(db_path) as con:
+        submissions = con.execute("SELECT count(*) FROM submissions").fetchone()[0]
+        bots = con.execute("SELECT count(*) FROM subsidy_bots").fetchone()[0]
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "db_path": os.path.abspath(db_path),
+        "db_bytes": os.path.getsize(db_path),
+        "submissions": submissions,
+        "subsidy_bots": bots,
+        "env": {
+            key: value
+            for key, value in os.environ.items()
+            if key.startswith(("SQLITE_", "INGEST_", "RATE_LIMIT_", "EXPORT_CACHE_"))
+        },
+    }
+
+
+def seed(db_path: str, count: int, seed_value: int = 1, batch_size: int = 5000) -> dict:
+    from app.bulk import ingest_records
+
+    app = make_app(db_path)
+    started = time.perf_counter()
+    accepted = 0
+    with app.app_context():
+        records = enumerate(generate_records(count, seed=seed_value), start=1)
+        for result in ingest_records(records, batch_size=batch_size):
+            accepted += result["status"] == "accepted"
+    elapsed = time.perf_counter() - started
+    return {
+        "requested": count,
+        "accepted": accepted,
+        "seconds": round(elapsed, 3),
+        "records_per_second": round(accepted / elapsed, 1) if elapsed else None,
+    }
+
+
+class TestClientTransport:
+    """Runs requests in-process through the Flask test client."""
+
+    def __init__(self, app) -> None:
+        self.client = app.test_client()
+
+    def login(self) -> None:
+        status, _ = self.request("POST", "/admin/login", {"username": BENCH_USER, "password": BENCH_PASSWORD})
+        if status != 302:
+            raise RuntimeError(f"bench login failed with HTTP {status}")
+
+    def request(self, method: str, url: str, data: dict | None = None) -> tuple[int, int]:
+        response = self.client.open(url, method=method, data=data)
+        size = sum(len(chunk) for chunk in response.response)
+        response.close()
+        return response.status_code, size
+
+
+class HttpTransport:
+    """Talks to a running server over HTTP, handling the session cookie and CSRF token."""
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            _NoRedirect(),
+        )
+        self._csrf_token: str | None = None
+
+    def _token(self) -> str:
+        if self._csrf_token is None:
+            with self.opener.open(self.base_url + "/admin/login") as response:
+                self._csrf_token = _CSRF_RE.search(response.read().decode()).group(1)
+        return self._csrf_token
+
+    def login(self) -> None:
+        status, _ = self.request("POST", "/admin/login", {"username": BENCH_USER, "password": BENCH_PASSWORD})
+        if status != 302:
+            raise RuntimeError(f"bench login failed with HTTP {status}")
+
+    def request(self, method: str, url: str, data: dict | None = None) -> tuple[int, int]:
+        body = None
+        if method == "POST":
+            body = urllib.parse.urlencode({"csrf_token": self._token(), **(data or {})}).encode()
+        request = urllib.request.Request(self.base_url + url, data=body, method=method)
+        try:
+            with self.opener.open(request) as response:
+                size = 0
+                while chunk := response.read(1 << 16):
+                    size += len(chunk)
+                return response.status, size
+        except urllib.error.HTTPError as exc:
+            return exc.code, len(exc.read())
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def free_uids(db_path: str, count: int) -> list[int]:
+    """The next ``count`` unused UIDs from the range seeding never touches."""
+    with sqlite3.connect(db_path) as con:
+        highest = con.execute(
+            "SELECT max(uid) FROM submissions WHERE uid >= ?", (f"{RESERVED_UID_START:07d}",)
+        ).fetchone()[0]
+    first = int(highest) + 1 if highest else RESERVED_UID_START
+    if first + count > 10**7:
+        raise RuntimeError("reserved UID range exhausted; reseed the benchmark database")
+    return list(range(first, first + count))
+
+
+def bench_posts(make_transport, uids: list[int], concurrency: int = 1) -> dict:
+    """POST / throughput with fresh UIDs, ``concurrency`` clients at a time."""
+    count = len(uids)
+    payloads = [form_payload(record) for record in generate_records(count, seed=7, uids=uids)]
+    statuses: dict[int, int] = {}
+    latencies: list[float] = []
+    lock = threading.Lock()
+
+    def worker(share: list[dict]) -> None:
+        transport = make_transport()
+        for payload in share:
+            started = time.perf_counter()
+            status, _ = transport.request("POST", "/", payload)
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(payloads[i::concurrency],)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": count,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(count / elapsed, 1) if elapsed else None,
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "latency": summarize(latencies),
+    }
+
+
+def _time_requests(transport, urls: list[str]) -> dict:
+    samples = []
+    for url in urls:
+        started = time.perf_counter()
+        status, _ = transport.request("GET", url)
+        samples.append(time.perf_counter() - started)
+        if status != 200:
+            raise RuntimeError(f"GET {url} returned HTTP {status}")
+    return summarize(samples)
+
+
+def bench_reads(transport, db_path: str, repeat: int = 20) -> dict:
+    with sqlite3.connect(db_path) as con:
+        sample = [row[0] for row in con.execute("SELECT uid FROM submissions ORDER BY random() LIMIT ?", (repeat,))]
+        ids = [row[0] for row in con.execute("SELECT id FROM submissions ORDER BY random() LIMIT ?", (repeat,))]
+        oldest = con.execute("SELECT created_at, id FROM submissions ORDER BY created_at, id LIMIT 1").fetchone()
+
+    def dashboard(query: dict) -> list[str]:
+        return ["/admin/?" + urllib.parse.urlencode(query)] * repeat
+
+    results = {
+        "dashboard": _time_requests(transport, dashboard({})),
+        "dashboard_last_page": _time_requests(
+            transport,
+            dashboard({"after": datetime.fromisoformat(oldest[0]).isoformat() + f"_{oldest[1]}"})
+            if oldest
+            else dashboard({}),
+        ),
+        "dashboard_q_exact": _time_requests(transport, ["/admin/?q=" + uid for uid in sample]),
+        "dashboard_q_prefix": _time_requests(transport, ["/admin/?q=" + uid[:4] + "*" for uid in sample]),
+        "dashboard_q_substring": _time_requests(transport, ["/admin/?q=" + uid[2:6] for uid in sample]),
+        "dashboard_q_short": _time_requests(transport, ["/admin/?q=" + uid[3:5] for uid in sample]),
+        "detail": _time_requests(transport, [f"/admin/submission/{submission_id}" for submission_id in ids]),
+    }
+    return results
+
+
+def probe_export(db_path: str, kind: str) -> dict:
+    """Run one export in this (fresh) process and report time and peak RSS."""
+    app = make_app(db_path)
+    transport = TestClientTransport(app)
+    transport.login()
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    first_byte = None
+    response = transport.client.get(f"/admin/export/{kind}.csv")
+    size = 0
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "status": response.status_code,
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+        "time_to_first_byte_ms": round((first_byte or elapsed) * 1000, 3),
+        "baseline_rss_kb": baseline_kb,
+        "peak_rss_kb": peak_kb,
+        "rss_growth_kb": peak_kb - baseline_kb,
+    }
+
+
+def bench_exports(db_path: str, kinds: list[str]) -> dict:
+    # Peak RSS is a per-process high-water mark, so each export gets its own process.
+    results = {}
+    for kind in kinds:
+        output = subprocess.run(
+            [sys.executable, "-m", "bench", "probe-export", "--db", db_path, "--kind", kind],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        results[kind] = json.loads(output)
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_gunicorn(db_path: str, posts: int, concurrency: int, workers: int, repeat: int) -> dict:
+    port = _free_port()
+    env = {
+        "RATE_LIMIT_ENABLED": "0",
+        "EXPORT_CACHE_DIR": "",
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.abspath(db_path)}",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "wsgi:app"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(base_url + "/thanks", timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.2)
+
+        def transport() -> HttpTransport:
+            return HttpTransport(base_url)
+
+        reader = transport()
+        reader.login()
+        return {
+            "workers": workers,
+            "post": bench_posts(transport, free_uids(db_path, posts), concurrency=concurrency),
+            "reads": bench_reads(reader, db_path, repeat=repeat),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run(
+    db_path: str,
+    posts: int = 200,
+    repeat: int = 20,
+    exports: list[str] | None = None,
+    gunicorn: bool = False,
+    concurrency: int = 8,
+    workers: int = 2,
+) -> dict:
+    app = make_app(db_path)
+    transport = TestClientTransport(app)
+    transport.login()
+
+    results = {
+        "meta": _metadata(db_path),
+        "test_client": {
+            "post": bench_posts(lambda: TestClientTransport(app), free_uids(db_path, posts)),
+            "reads": bench_reads(transport, db_path, repeat=repeat),
+        },
+        "exports": bench_exports(db_path, EXPORT_KINDS if exports is None else exports),
+    }
+    if gunicorn:
+        results["gunicorn"] = bench_gunicorn(db_path, posts, concurrency, workers, repeat)
+    return results
@@ -0,0 +1,38 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app import create_app, db
+from app.models import Submission, SubsidyBot
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setenv("ARCHIVE_DATABASE_PATH", str(tmp_path / "archive.db"))
+    monkeypatch.setenv("EXPORT_CACHE_DIR", "")
+    monkeypatch.setenv("EXPORT_JOB_DIR", str(tmp_path / "export_jobs"))
+    monkeypatch.setenv("AUTH_STAMP_PATH", str(tmp_path / "auth_stamp"))
+    monkeypatch.setenv("STATIC_CACHE_DIR", str(tmp_path / "static_cache"))
+    monkeypatch.setenv("RATE_LIMIT_DATABASE_PATH", str(tmp_path / "rate_limit.db"))
+    monkeypatch.setenv("SECRET_KEY", "test")
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def add_submission(app):
+    def add(uid, created_at=datetime(2024, 1, 1), s_level="S1", subsidies=(("Alpha", Decimal("1.50")),)):
+        submission = Submission(uid=uid, s_level=s_level, missed_salary_amount=Decimal("10.00"), created_at=created_at)
+        for name, cents in subsidies:
+            submission.subsidy_bots.append(SubsidyBot(bot_name=name, subsidy_amount=cents))
+        db.session.add(submission)
+        db.session.commit()
+        return submission.id
+
+    return add
@@ -0,0 +1,92 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import delete, select, text
+
+from app import db
+from app.archive import ARCHIVE_SCHEMA_VERSION, archive_schema_version, archive_submissions
+from app.models import Submission
+from app.stats import rebuild_submission_stats
+
+
+CUTOFF = datetime(2025, 1, 1)
+
+
+def _archived(column="uid"):
+    return db.session.execute(text(f"SELECT id, {column} FROM archive.submissions ORDER BY id")).all()
+
+
+def test_rearchive_after_newest_live_row_is_deleted(add_submission):
+    first = add_submission("5000000", subsidies=(("Alpha", 1), ("Beta", 2)))
+    add_submission("5000001")
+    newest = add_submission("5000002")
+    assert archive_submissions(CUTOFF) == 3
+
+    db.session.execute(delete(Submission).where(Submission.id == newest))
+    db.session.commit()
+    reinserted = add_submission("5000009")
+    assert reinserted > newest
+    assert archive_submissions(CUTOFF) == 1
+
+    assert [uid for _, uid in _archived()] == ["5000000", "5000001", "5000002", "5000009"]
+    children = db.session.scalar(text("SELECT count(*) FROM archive.subsidy_bots WHERE submission_id = :id"), {"id": first})
+    assert children == 2
+    assert db.session.scalar(select(Submission.id)) is None
+
+
+def test_rearchive_replaces_only_the_same_submission(add_submission):
+    interrupted = add_submission("5000000")
+    # A run interrupted between the archive and the main commit left a copy behind.
+    columns = ", ".join(column.name for column in Submission.__table__.c)
+    db.session.execute(
+        text(f"INSERT INTO archive.submissions ({columns}) SELECT {columns} FROM main.submissions WHERE id = :id"),
+        {"id": interrupted},
+    )
+    db.session.commit()
+    assert archive_submissions(CUTOFF) == 1
+    assert _archived() == [(interrupted, "5000000")]
+
+
+def test_archive_refuses_an_id_held_by_another_archived_submission(add_submission):
+    live = add_submission("5000000")
+    db.session.execute(
+        text(
+            "INSERT INTO archive.submissions (id, uid, s_level, owed_yy_bots, rented_more_than_2_yy_bots, "
+            "owed_fortibots_tickets, pending_withdraws, created_at) "
+            "VALUES (:id, '5000009', 'S1', 0, 0, 0, 0, '2023-01-01 00:00:00')"
+        ),
+        {"id": live},
+    )
+    db.session.commit()
+
+    with pytest.raises(RuntimeError, match="already holds"):
+        archive_submissions(CUTOFF)
+    assert _archived() == [(live, "5000009")]
+    assert db.session.scalar(select(Submission.uid).where(Submission.id == live)) == "5000000"
+
+
+def test_startup_only_attaches_a_current_archive(app, monkeypatch):
+    from app import create_app, db_migrations
+
+    assert archive_schema_version(db.session) == ARCHIVE_SCHEMA_VERSION
+    db.session.remove()
+    monkeypatch.setattr(db_migrations, "upgrade_archive", lambda connection: pytest.fail("archive schema recreated"))
+    create_app()
+
+
+def test_archiving_keeps_stats_totals(app, add_submission):
+    add_submission("5000000", subsidies=(("Alpha", Decimal("1.25")), ("Beta", Decimal("2.50"))))
+    add_submission("5000001", s_level="S2")
+    add_submission("5000002", created_at=datetime(2025, 6, 1))
+    client = app.test_client()
+    client.application.config["LOGIN_DISABLED"] = True
+    before = client.get("/admin/stats.json").get_json()
+
+    assert archive_submissions(CUTOFF) == 2
+    db.session.remove()
+    assert client.get("/admin/stats.json").get_json() == before
+
+    rebuild_submission_stats()
+    db.session.commit()
+    assert client.get("/admin/stats.json").get_json() == before
@@ -0,0 +1,55 @@
+import time
+
+from flask import request
+
+from app.rate_limit import RateLimiter, TokenBuckets
+
+
+def test_ip_limit_rejects_before_the_form_is_parsed(app):
+    limiter = app.extensions["rate_limit"]
+    limiter.ip_limit = (1, 1 / 60)
+
+    for expected in (None, 429):
+        with app.test_request_context("/", method="POST", data={"uid": "5000000"}):
+            response = limiter.check()
+            assert (response and response.status_code) == expected
+            # The UID bucket reads the form only once the IP bucket let the request through.
+            assert ("form" in request.__dict__) == (expected is None)
+            limiter.release()
+
+
+def test_concurrency_slots_are_shared_by_workers(app, tmp_path, monkeypatch):
+    path = str(tmp_path / "rate_limit.db")
+    first, second = TokenBuckets(path), TokenBuckets(path)
+
+    held = [first.lease(2, 60), second.lease(2, 60)]
+    assert all(held)
+    assert first.lease(2, 60) is None
+    second.release(held.pop())
+    assert first.lease(2, 60)
+
+    # A lease nobody released (its worker died) stops counting once it expires.
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert second.lease(2, 60) and second.lease(2, 60)
+    assert second.lease(2, 60) is None
+
+
+def test_busy_site_answers_503_and_releases_the_slot(app):
+    app.config["RATE_LIMIT_MAX_CONCURRENT"] = 1
+    limiter = RateLimiter(app.extensions["rate_limit"].buckets, app.config)
+    other_worker = TokenBuckets(app.config["RATE_LIMIT_DATABASE_PATH"])
+    lease = other_worker.lease(1, 60)
+
+    with app.test_request_context("/", method="POST"):
+        response = limiter.check()
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        limiter.release()
+
+    other_worker.release(lease)
+    with app.test_request_context("/", method="POST"):
+        assert limiter.check() is None
+        assert other_worker.lease(1, 60) is None
+        limiter.release()
+    assert other_worker.lease(1, 60)